@@ -0,0 +1,102 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import altair as alt
+from database import get_score_matrix
+from score_matrix import METRICS
+
+ORDERINGS = {
+    'family': "Family, then subfamily",
+    'name': "Language name",
+    'score': "Mean score as source",
+}
+
+def group_options(groups, id_column, name_column):
+    """Ids and labels of the families or subfamilies present in the matrix, by name."""
+    present = groups.dropna(subset=[id_column]).drop_duplicates(id_column)
+    present = present.sort_values(name_column, na_position='last')
+    return {int(i): name if isinstance(name, str) else f"#{int(i)}"
+            for i, name in zip(present[id_column], present[name_column])}
+
+def create_heatmap(cells, order, metric):
+    """Source-by-target heatmap of the scored cells, in the given language order."""
+    return alt.Chart(cells).mark_rect().encode(
+        x=alt.X('target_language:N', sort=list(order), title='Target Language'),
+        y=alt.Y('source_language:N', sort=list(order), title='Source Language'),
+        color=alt.Color('score:Q', title=metric, scale=alt.Scale(scheme='redyellowgreen')),
+        tooltip=[
+            alt.Tooltip('source_language:N', title='Source'),
+            alt.Tooltip('target_language:N', title='Target'),
+            alt.Tooltip('score:Q', title=metric, format='.2f'),
+        ]
+    ).properties(height=max(300, 14 * len(order)))
+
+def language_stats(matrix, positions, values):
+    """One row per language with its statistics as source and as target."""
+    groups = matrix.groups.iloc[positions].reset_index(drop=True)
+    as_source = matrix.row_stats(values).add_prefix('source_')
+    as_target = matrix.column_stats(values).add_prefix('target_')
+    return pd.concat([groups[['name', 'family_name', 'subfamily_name']], as_source, as_target], axis=1)
+
+def render_score_matrix_page():
+    """Render the language-by-language score matrix with group filters and statistics."""
+    st.title("Translation Score Matrix")
+    matrix = get_score_matrix()
+    if len(matrix.ids) == 0:
+        st.info("No translation pairs are linked to languages yet.")
+        return
+
+    families = group_options(matrix.groups, 'family_id', 'family_name')
+    subfamilies = group_options(matrix.groups, 'subfamily_id', 'subfamily_name')
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        metric = st.radio("Metric", list(METRICS), horizontal=True)
+    with col2:
+        order_by = st.selectbox("Order languages by", list(ORDERINGS), format_func=ORDERINGS.get)
+    with col3:
+        group_level = st.radio("Filter by", ["Family", "Subfamily"], horizontal=True)
+
+    options = families if group_level == "Family" else subfamilies
+    chosen = st.multiselect(f"{group_level} (none selected shows all)", list(options), format_func=options.get)
+
+    # Subsetting and statistics are slices of the shared matrices
+    if not chosen:
+        positions = matrix.select()
+    elif group_level == "Family":
+        positions = matrix.select(families=chosen)
+    else:
+        positions = matrix.select(subfamilies=chosen)
+    positions = matrix.order(positions, order_by, metric)
+    values = matrix.submatrix(positions, metric)
+    names = matrix.names(positions)
+    cells = matrix.long_frame(positions, metric)
+
+    scored = int(np.count_nonzero(~np.isnan(values)))
+    st.caption(f"{len(positions)} languages, {scored} of {len(positions) ** 2} directed pairs scored")
+
+    if scored:
+        st.altair_chart(
+            create_heatmap(cells, names, metric),
+            use_container_width=True
+        )
+    else:
+        st.info("No scored pairs among the selected languages.")
+
+    st.markdown("### Per-Language Statistics")
+    st.dataframe(
+        language_stats(matrix, positions, values).style.format(
+            {f'{side}_{stat}': '{:.2f}' for side in ('source', 'target') for stat in ('mean', 'min', 'max')},
+            na_rep='–'
+        ),
+        use_container_width=True
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### Weakest Pairs")
+        st.dataframe(cells.nsmallest(20, 'score'), use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown("### Direction Asymmetry")
+        st.caption(f"A→B minus B→A {metric}, for pairs scored both ways")
+        st.dataframe(matrix.asymmetry(positions, metric).head(20), use_container_width=True, hide_index=True)
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Optional dependencies whose import cost should show up only on their pages
+HEAVY_MODULES = ['folium', 'altair', 'map_utils', 'language_info', 'db_utils']
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+def page_setups(family_id, subfamily_id, language_id):
+    """Sidebar choice and query parameters that open each page on a first run."""
+    return {
+        'map': ("Map View", {}),
+        'nmt_pairs': ("NMT Pairs", {}),
+        'admin': ("Database Upload", {}),
+        'matrix': ("Score Matrix", {}),
+        'nearby': ("Nearby Languages", {}),
+        'family': ("Map View", {'family_id': str(family_id)}),
+        'subfamily': ("Map View", {'subfamily_id': str(subfamily_id)}),
+        'language': ("Map View", {'selected_language': str(language_id)}),
+    }
+
+def measure_page(page, navigation, params, timeout):
+    """Time importing main and the first run of one page in this process.
+
+    Must run in a fresh interpreter: the import time is only meaningful
+    before any app module has been loaded.
+    """
+    started = time.perf_counter()
+    import main  # noqa: F401
+    imported = time.perf_counter()
+
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.session_state['page'] = navigation
+    for name, value in params.items():
+        app.query_params[name] = value
+    render_started = time.perf_counter()
+    app.run()
+    rendered = time.perf_counter()
+
+    return {
+        'page': page,
+        'import_ms': (imported - started) * 1000,
+        'render_ms': (rendered - render_started) * 1000,
+        'errors': [e.value for e in app.error] + [str(e.value) for e in app.exception],
+        'heavy_modules': [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+def run_child(page, args):
+    """Measure one page in a new interpreter and return its result dict."""
+    command = [
+        sys.executable, __file__, '--child', page,
+        '--family-id', str(args.family_id), '--subfamily-id', str(args.subfamily_id),
+        '--language-id', str(args.language_id), '--timeout', str(args.timeout),
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{page}: benchmark process failed\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def summarize(page, runs):
+    """Median timings over the runs of one page."""
+    return {
+        'page': page,
+        'import_ms': statistics.median(r['import_ms'] for r in runs),
+        'render_ms': statistics.median(r['render_ms'] for r in runs),
+        'errors': runs[-1]['errors'],
+        'heavy_modules': runs[-1]['heavy_modules'],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure cold-start import and first-render time per page, "
+                    "each in a fresh Python process."
+    )
+    parser.add_argument('pages', nargs='*', help="pages to measure (default: all)")
+    parser.add_argument('--runs', type=int, default=3, help="fresh processes per page; the median is reported")
+    parser.add_argument('--family-id', type=int, default=1)
+    parser.add_argument('--subfamily-id', type=int, default=1)
+    parser.add_argument('--language-id', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=120, help="seconds allowed for one page run")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    setups = page_setups(args.family_id, args.subfamily_id, args.language_id)
+    if args.child:
+        navigation, params = setups[args.child]
+        print(json.dumps(measure_page(args.child, navigation, params, args.timeout)))
+        sys.exit(0)
+
+    unknown = [page for page in args.pages if page not in setups]
+    if unknown:
+        parser.error(f"unknown pages: {', '.join(unknown)} (choose from {', '.join(setups)})")
+
+    results = [
+        summarize(page, [run_child(page, args) for _ in range(args.runs)])
+        for page in args.pages or list(setups)
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'page':<10} {'import ms':>10} {'render ms':>10} {'total ms':>10}  heavy modules loaded")
+        for r in results:
+            total = r['import_ms'] + r['render_ms']
+            modules = ', '.join(r['heavy_modules']) or '-'
+            print(f"{r['page']:<10} {r['import_ms']:>10.0f} {r['render_ms']:>10.0f} {total:>10.0f}  {modules}")
+            for error in r['errors']:
+                print(f"           error: {error}")
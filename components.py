@@ -1,5 +1,18 @@
+from collections import namedtuple
 import streamlit as st
 import pandas as pd
+import numpy as np
+from model_mask import POPCOUNT, mask_to_models, model_masks, matches_selection
+
+# Which translation pairs the map draws: language_id None means every
+# language; top_k keeps the strongest pairs by chrF++ and min_chrf drops
+# weaker ones, either may be None
+ConnectionOptions = namedtuple('ConnectionOptions', ['language_id', 'top_k', 'min_chrf'])
+
+CONNECTION_MODES = ["None", "One language", "All languages"]
+
+# Strongest pairs drawn by default, for one language and for all of them
+DEFAULT_TOP_K = {"One language": 50, "All languages": 500}
 
 def render_model_filters(model_types):
     """Render model type filters in a clean, compact layout."""
@@ -40,6 +53,28 @@ def render_model_filters(model_types):
 
     return st.session_state.selected_models
 
+def render_connection_filters(df):
+    """Render the translation pair controls; return ConnectionOptions, or None for no lines."""
+    mode = st.radio("Show pairs for", CONNECTION_MODES, key="connection_mode")
+    if mode == "None":
+        return None
+
+    language_id = None
+    if mode == "One language":
+        with_pairs = df[df['nmt_pair_count'].fillna(0) > 0].sort_values('name')
+        if with_pairs.empty:
+            st.caption("No language has translation pairs.")
+            return None
+        names = dict(zip(with_pairs['id'].tolist(), with_pairs['name'].tolist()))
+        language_id = st.selectbox("Language", list(names), format_func=names.get, key="connection_language")
+
+    top_k = st.number_input(
+        "Strongest pairs", min_value=1, max_value=10000, value=DEFAULT_TOP_K[mode], step=10,
+        key=f"connection_top_k_{mode}"
+    )
+    min_chrf = st.slider("Minimum chrF++", 0.0, 100.0, 0.0, step=5.0, key="connection_min_chrf")
+    return ConnectionOptions(language_id, int(top_k), min_chrf or None)
+
 def render_statistics(df):
     """Render statistics about languages and models."""
     col1, col2, col3 = st.columns(3)
@@ -47,12 +82,14 @@ def render_statistics(df):
     with col1:
         st.metric("Total Languages", len(df))
 
+    masks = model_masks(df)
+
     with col2:
-        total_models = sum(len([x for x in models if x]) for models in df['available_models'])
+        total_models = int(POPCOUNT[masks].sum())
         st.metric("Total Model Implementations", total_models)
 
     with col3:
-        languages_with_models = len(df[df['available_models'].apply(lambda x: any(m for m in x if m))])
+        languages_with_models = int(np.count_nonzero(masks))
         st.metric("Languages with Models", languages_with_models)
 
 def render_search_page(df, search_query, selected_models):
@@ -80,18 +117,10 @@ def render_search_page(df, search_query, selected_models):
         ]
 
     if selected_models:
-        filtered_df = filtered_df[
-            filtered_df['available_models'].apply(
-                lambda x: any(model in x for model in selected_models)
-            )
-        ]
+        filtered_df = filtered_df[matches_selection(model_masks(filtered_df), selected_models)]
 
     if min_models > 0:
-        filtered_df = filtered_df[
-            filtered_df['available_models'].apply(
-                lambda x: len([m for m in x if m]) >= min_models
-            )
-        ]
+        filtered_df = filtered_df[POPCOUNT[model_masks(filtered_df)] >= min_models]
 
     if show_only_with_coords:
         filtered_df = filtered_df[
@@ -101,7 +130,7 @@ def render_search_page(df, search_query, selected_models):
     # Display results
     st.subheader(f"Results ({len(filtered_df)} languages)")
 
-    for idx, row in filtered_df.iterrows():
+    for (idx, row), mask in zip(filtered_df.iterrows(), model_masks(filtered_df)):
         with st.container():
             col1, col2 = st.columns([3, 1])
             with col1:
@@ -109,7 +138,7 @@ def render_search_page(df, search_query, selected_models):
                     st.session_state.selected_language = row['id']
                     st.rerun()
             with col2:
-                models = [m for m in row['available_models'] if m]
+                models = mask_to_models(mask)
                 if models:
                     model_badges = []
                     for model in models:
@@ -134,21 +163,17 @@ def render_language_table(df, search_query, selected_models):
         ]
 
     if selected_models:
-        filtered_df = filtered_df[
-            filtered_df['available_models'].apply(
-                lambda x: any(model in x for model in selected_models)
-            )
-        ]
+        filtered_df = filtered_df[matches_selection(model_masks(filtered_df), selected_models)]
 
     if not filtered_df.empty:
-        for idx, row in filtered_df.iterrows():
+        for (idx, row), mask in zip(filtered_df.iterrows(), model_masks(filtered_df)):
             col1, col2 = st.columns([3, 1])
             with col1:
                 if st.button(row['name'], key=f"lang_{idx}"):
                     st.session_state.selected_language = row['id']
                     st.rerun()
             with col2:
-                models = [m for m in row['available_models'] if m]
+                models = mask_to_models(mask)
                 if models:
                     model_badges = []
                     for model in models:
@@ -1,8 +1,39 @@
 import os
+import pickle
+import time
 import pandas as pd
 from sqlalchemy import create_engine, text
 import streamlit as st
 from contextlib import contextmanager
+from migrations import run_migrations
+from pair_store import load_pair_store
+from edge_index import EdgeIndex
+from score_matrix import LANGUAGE_GROUPS_QUERY, ScoreMatrix
+from routing import PivotRouter
+from spatial_index import SpatialIndex
+from model_mask import model_masks
+from offline import OfflineDataset, offline_dir, offline_generation, read_offline_tables
+from snapshot import (
+    snapshot_dir, snapshot_version, read_language_snapshot, write_language_snapshot,
+    read_pair_snapshot, write_pair_snapshot
+)
+
+# 'postgres' (default) or 'snapshot' to serve every query from the offline
+# tables built by offline.py, with no database at all
+DATA_BACKEND = os.getenv('DATA_BACKEND', 'postgres')
+
+def offline_mode():
+    """True when the dashboard runs from the offline snapshot instead of Postgres."""
+    return DATA_BACKEND == 'snapshot'
+
+@st.cache_resource(max_entries=1)
+def _load_offline_dataset(generation):
+    """Read the offline tables once per process for one generation."""
+    return OfflineDataset(read_offline_tables(offline_dir()))
+
+def get_offline_dataset():
+    """Get the offline dataset, reloaded when offline.py rewrites its files."""
+    return _load_offline_dataset(offline_generation(offline_dir()))
 
 @st.cache_resource
 def get_database_connection():
@@ -29,137 +60,234 @@ def get_db_session():
     finally:
         connection.close()
 
-@st.cache_data
+@st.cache_resource
+def ensure_schema():
+    """Bring the database schema up to date once per process.
+
+    The app's tables come from a restored dump; until one exists, only the
+    app's own tables are created and the dataset migrations stay pending.
+    """
+    if offline_mode():
+        return True
+    with get_db_session() as connection:
+        run_migrations(connection)
+    return True
+
+# Data scopes that caches are keyed on; a restore or import bumps the ones it touches
+LANGUAGES = 'languages'
+PAIRS = 'pairs'
+
+# How long a process trusts its last read of the generation table
+GENERATION_TTL_SECONDS = 10
+
+@st.cache_data(ttl=GENERATION_TTL_SECONDS)
+def get_data_generations():
+    """Read the current generation token of every data scope."""
+    if offline_mode():
+        generation = offline_generation(offline_dir())
+        return {LANGUAGES: generation, PAIRS: generation}
+    ensure_schema()
+    with get_db_session() as connection:
+        rows = connection.execute(text("SELECT scope, generation FROM data_generation")).all()
+    return dict(rows)
+
+def data_generation(*scopes):
+    """Cache key for data derived from the given scopes; 0 for a scope never bumped."""
+    generations = get_data_generations()
+    return tuple(generations.get(scope, 0) for scope in scopes)
+
+def bump_data_generation(*scopes):
+    """Mark the given scopes as changed so every cache keyed on them misses."""
+    if offline_mode():
+        get_data_generations.clear()
+        return
+    ensure_schema()
+    with get_db_session() as connection:
+        # Tokens are clock based rather than counters so they never repeat,
+        # even if a restore dropped and recreated this table.
+        for scope in scopes:
+            connection.execute(text("""
+                INSERT INTO data_generation (scope, generation)
+                VALUES (:scope, (extract(epoch FROM clock_timestamp()) * 1000000)::bigint)
+                ON CONFLICT (scope) DO UPDATE SET
+                    generation = GREATEST(
+                        data_generation.generation + 1,
+                        EXCLUDED.generation
+                    ),
+                    updated_at = now()
+                """), {'scope': scope})
+    get_data_generations.clear()
+
+def refresh_language_snapshot():
+    """Rebuild the language connection views from the current pair table.
+
+    The snapshot the pages read is refreshed CONCURRENTLY, in its own
+    transaction, so readers keep the old rows instead of waiting for the
+    rebuild. language_edges has no unique key and is refreshed plainly.
+    """
+    ensure_schema()
+    # Order matters: the snapshot aggregates over language_edges.
+    with get_db_session() as connection:
+        connection.execute(text("REFRESH MATERIALIZED VIEW language_edges"))
+    with get_db_session() as connection:
+        connection.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY language_connection_snapshot"))
+
+LANGUAGE_SNAPSHOT_QUERY = """
+    SELECT
+        id,
+        name,
+        iso_code,
+        latitude,
+        longitude,
+        available_models,
+        model_mask,
+        nmt_pair_count,
+        has_nmt_pair
+    FROM language_connection_snapshot
+    ORDER BY name
+    """
+
 def load_language_data():
-    """Load language data from PostgreSQL database with NMT pair information."""
+    """Load language data with NMT pair information from the precomputed snapshot.
+
+    Returns a zero-copy view of the frame shared by every session. The app
+    enables Copy-on-Write (see main.py), so a session that modifies its view
+    copies the data instead of changing the shared frame.
+    """
+    return _load_language_data(data_generation(LANGUAGES, PAIRS)).copy(deep=False)
+
+@st.cache_resource(max_entries=2)
+def _load_language_data(generation):
+    """Load the language snapshot for one data generation, held once per process.
+
+    With SNAPSHOT_DIR set, the frame is read from the shared snapshot file
+    for this generation, and the database is queried only to create it.
+    """
+    if offline_mode():
+        return get_offline_dataset().language_frame()
+
+    version = snapshot_version(generation)
+    if snapshot_dir():
+        df = read_language_snapshot(version)
+        if df is not None:
+            return df
+
+    ensure_schema()
     with get_db_session() as connection:
-        query = """
-            WITH ordered_pairs AS (
-                SELECT 
-                    l1.id as source_id,
-                    l2.lang_name as target_name,
-                    l2.id as target_id,
-                    ARRAY[
-                        ST_Y(l2.coordinates::geometry),
-                        ST_X(l2.coordinates::geometry)
-                    ]::float[] as target_coords,
-                    nps.chrf_plus,
-                    nps.spbleu_spm_200
-                FROM language_new l1
-                JOIN nmt_pairs_source nps ON l1.id = nps.source_lang_id OR l1.id = nps.target_lang_id
-                JOIN language_new l2 ON 
-                    (nps.source_lang_id = l2.id OR nps.target_lang_id = l2.id) AND
-                    l2.id != l1.id
-                WHERE l2.coordinates IS NOT NULL
-                    AND ST_IsValid(l2.coordinates::geometry)
-                ORDER BY l2.lang_name
-            ),
-            lang_connections AS (
-                SELECT 
-                    source_id as lang_id,
-                    array_agg(DISTINCT target_name) as connected_languages,
-                    array_agg(DISTINCT target_coords) FILTER (WHERE 
-                        target_coords[1] BETWEEN -90 AND 90
-                        AND target_coords[2] BETWEEN -180 AND 180
-                    ) as connected_coords,
-                    array_agg(DISTINCT target_id) as connected_lang_ids,
-                    array_agg(DISTINCT chrf_plus) as chrf_scores,
-                    array_agg(DISTINCT spbleu_spm_200) as bleu_scores
-                FROM ordered_pairs
-                GROUP BY source_id
-            )
-            SELECT 
-                l.id,
-                l.lang_name as name,
-                l.iso_code,
-                ST_Y(l.coordinates::geometry) as latitude,
-                ST_X(l.coordinates::geometry) as longitude,
-                ARRAY[
-                    CASE WHEN l.asr THEN 'ASR' END,
-                    CASE WHEN l.nmt THEN 'NMT' END,
-                    CASE WHEN l.tts THEN 'TTS' END
-                ] as available_models,
-                (SELECT COUNT(*)
-                 FROM nmt_pairs_source nps
-                 WHERE nps.source_lang_id = l.id OR nps.target_lang_id = l.id) as nmt_pair_count,
-                COALESCE(lc.connected_languages, ARRAY[]::text[]) as connected_languages,
-                COALESCE(lc.connected_coords, ARRAY[]::float[][]) as connected_coords,
-                COALESCE(lc.connected_lang_ids, ARRAY[]::integer[]) as connected_lang_ids,
-                COALESCE(lc.chrf_scores, ARRAY[]::float[]) as chrf_scores,
-                COALESCE(lc.bleu_scores, ARRAY[]::float[]) as bleu_scores,
-                CASE WHEN lc.lang_id IS NOT NULL THEN TRUE ELSE FALSE END as has_nmt_pair
-            FROM language_new l
-            LEFT JOIN lang_connections lc ON l.id = lc.lang_id
-            WHERE l.coordinates IS NOT NULL
-                AND ST_IsValid(l.coordinates::geometry)
-                AND ST_X(l.coordinates::geometry) BETWEEN -180 AND 180
-                AND ST_Y(l.coordinates::geometry) BETWEEN -90 AND 90
-            ORDER BY l.lang_name
-            """
-        return pd.read_sql(query, connection)
+        df = pd.read_sql(text(LANGUAGE_SNAPSHOT_QUERY), connection)
+    if snapshot_dir():
+        _write_snapshot(write_language_snapshot, df, version)
+    return df
+
+def _write_snapshot(write, data, version):
+    """Write a snapshot file; a read-only or full directory only costs the next start."""
+    try:
+        write(data, version)
+    except OSError as e:
+        print(f"Could not write snapshot {version}: {e}")
 
 @st.cache_data
 def get_model_types():
     """Get unique model types from database."""
     return ['ASR', 'NMT', 'TTS']
 
-@st.cache_data
+def get_pair_store():
+    """Get the process-wide NMT pair store for the current data generation."""
+    return _build_pair_store(data_generation(LANGUAGES, PAIRS))
+
+@st.cache_resource(max_entries=1)
+def _build_pair_store(generation):
+    """Build the pair store for one data generation, from the shared snapshot if present."""
+    if offline_mode():
+        return get_offline_dataset().pair_store()
+
+    version = snapshot_version(generation)
+    if snapshot_dir():
+        store = read_pair_snapshot(version)
+        if store is not None:
+            return store
+
+    with get_db_session() as connection:
+        store = load_pair_store(connection)
+    if snapshot_dir():
+        _write_snapshot(write_pair_snapshot, store, version)
+    return store
+
+def get_edge_index():
+    """Get the process-wide per-language edge index for the current data generation."""
+    return _build_edge_index(data_generation(LANGUAGES, PAIRS))
+
+@st.cache_resource(max_entries=1)
+def _build_edge_index(generation):
+    """Build the edge index for one data generation from the shared pair store and frame."""
+    return EdgeIndex(_build_pair_store(generation), _load_language_data(generation))
+
+def get_score_matrix():
+    """Get the process-wide dense score matrices for the current data generation."""
+    return _build_score_matrix(data_generation(LANGUAGES, PAIRS))
+
+@st.cache_resource(max_entries=1)
+def _build_score_matrix(generation):
+    """Build the score matrices for one data generation from the shared pair store."""
+    if offline_mode():
+        groups = get_offline_dataset().language_groups()
+    else:
+        with get_db_session() as connection:
+            groups = pd.read_sql(text(LANGUAGE_GROUPS_QUERY), connection)
+    return ScoreMatrix(_build_pair_store(generation), groups)
+
+def get_pivot_router():
+    """Get the process-wide pivot router for the current data generation."""
+    return _build_pivot_router(data_generation(LANGUAGES, PAIRS))
+
+@st.cache_resource(max_entries=1)
+def _build_pivot_router(generation):
+    """Precompute the bottleneck route tables for one data generation."""
+    return PivotRouter(_build_score_matrix(generation))
+
+def get_spatial_index():
+    """Get the process-wide spatial index of the mapped languages."""
+    return _build_spatial_index(data_generation(LANGUAGES, PAIRS))
+
+@st.cache_resource(max_entries=1)
+def _build_spatial_index(generation):
+    """Grid the language frame of one data generation for proximity search."""
+    languages = _load_language_data(generation)
+    return SpatialIndex(languages, model_masks(languages))
+
 def get_language_nmt_pairs(language_id):
     """Get NMT pairs for a specific language."""
-    with get_db_session() as connection:
-        query = """
-        SELECT 
-            nps.chrf_plus as chrf_score,
-            nps.spbleu_spm_200 as bleu_score,
-            source_lang.lang_name AS source_language,
-            target_lang.lang_name AS target_language,
-            CASE 
-                WHEN source_lang.id = :lang_id THEN 'Source'
-                ELSE 'Target'
-            END as role
-        FROM 
-            nmt_pairs_source nps
-        LEFT JOIN 
-            language_new AS source_lang 
-        ON 
-            nps.source_lang_id = source_lang.id
-        LEFT JOIN 
-            language_new AS target_lang 
-        ON 
-            nps.target_lang_id = target_lang.id
-        WHERE 
-            nps.source_lang_id IS NOT NULL
-            AND nps.target_lang_id IS NOT NULL
-            AND (source_lang.id = :lang_id OR target_lang.id = :lang_id)
-        ORDER BY 
-            role, nps.chrf_plus DESC NULLS LAST;
-        """
-        return pd.read_sql(text(query), connection, params={'lang_id': language_id})
+    return get_pair_store().language_pairs(language_id)
 
-@st.cache_data
 def get_all_nmt_pairs():
     """Get all NMT pairs with their scores."""
-    with get_db_session() as connection:
-        query = """
-        SELECT 
-            nps.chrf_plus as chrf_score,
-            nps.spbleu_spm_200 as bleu_score,
-            source_lang.lang_name AS source_language,
-            target_lang.lang_name AS target_language
-        FROM 
-            nmt_pairs_source nps
-        LEFT JOIN 
-            language_new AS source_lang 
-        ON 
-            nps.source_lang_id = source_lang.id
-        LEFT JOIN 
-            language_new AS target_lang 
-        ON 
-            nps.target_lang_id = target_lang.id
-        WHERE 
-            nps.source_lang_id IS NOT NULL
-            AND nps.target_lang_id IS NOT NULL
-        ORDER BY 
-            nps.chrf_plus DESC NULLS LAST;
-        """
-        return pd.read_sql(query, connection)
\ No newline at end of file
+    return get_pair_store().all_pairs()
+
+@st.cache_resource(max_entries=1)
+def _measure_shared_data(generation):
+    """Sizes and unpickling time of one generation's shared data, measured once."""
+    df = _load_language_data(generation)
+    payload = pickle.dumps(df)
+    start = time.perf_counter()
+    pickle.loads(payload)
+    unpickle_ms = (time.perf_counter() - start) * 1000
+    return {
+        'frame_bytes': int(df.memory_usage(deep=True).sum()),
+        'pair_store_bytes': _build_pair_store(generation).nbytes,
+        'edge_index_bytes': _build_edge_index(generation).nbytes,
+        'pickled_bytes': len(payload),
+        'unpickle_ms_per_rerun': unpickle_ms,
+    }
+
+def dataset_memory_report(concurrent_sessions=10):
+    """Compare holding the language frame per session, as st.cache_data did, with sharing it.
+
+    st.cache_data unpickles a fresh copy on every call, so each concurrent
+    session holds its own frame; the shared frame is held once per process.
+    The measurements are taken once per data generation.
+    """
+    report = dict(_measure_shared_data(data_generation(LANGUAGES, PAIRS)))
+    report['concurrent_sessions'] = concurrent_sessions
+    report['copied_total_bytes'] = report['frame_bytes'] * concurrent_sessions
+    report['shared_total_bytes'] = report['frame_bytes']
+    return report
@@ -1,93 +1,139 @@
-import os
-import subprocess
-import tempfile
+import time
 import streamlit as st
+from sqlalchemy.exc import OperationalError
+from database import LANGUAGES, PAIRS, bump_data_generation, get_db_session
+from importer import import_score_file
+from restore import RestoreJob, save_upload
+from staging import build_staging, drop_staging, prepare_staging, swap_staging, validate_staging
 
-def handle_backup_upload():
-    """Handle the upload of a PostgreSQL database backup file."""
-    uploaded_file = st.file_uploader("Choose a PostgreSQL backup file", type=['sql', 'dump'])
+# Attempts at the swap when readers hold the live tables past the lock timeout
+SWAP_ATTEMPTS = 3
+
+def _prepare_restore(job):
+    """Create an empty staging schema for the dump to load into."""
+    job.set_stage("Preparing staging schema...")
+    with get_db_session() as connection:
+        prepare_staging(connection)
+
+def _publish_restore(job):
+    """Build, validate and swap in the staged dataset, then invalidate caches."""
+    job.set_stage("Building indexes and language connection views in staging...")
+    with get_db_session() as connection:
+        build_staging(connection)
 
-    if uploaded_file is not None:
+    job.set_stage("Validating staged data...")
+    with get_db_session() as connection:
+        checks = validate_staging(connection)
+    for check in checks:
+        status = "OK  " if check.ok else ("FAIL" if check.fatal else "WARN")
+        job.log.append(f"{status} {check.name}: {check.value}")
+    failed = [check.name for check in checks if check.fatal and not check.ok]
+    if failed:
+        raise RuntimeError(f"Validation failed ({', '.join(failed)}); the live data was not changed")
+
+    job.set_stage("Swapping staged tables into place...")
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
         try:
-            # Create a temporary file to store the upload
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.sql') as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_file_path = tmp_file.name
-
-            # Add detailed logging
-            st.write("Attempting to restore backup...")
-
-            # First, try to check the backup file content
-            st.write("Analyzing backup file contents...")
-            with open(tmp_file_path, 'r') as f:
-                backup_content = f.read()
-                st.write(f"Backup file size: {len(backup_content)} bytes")
-
-            # Construct psql command using environment variables
-            env = os.environ.copy()
-            db_params = {
-                'host': os.getenv('PGHOST'),
-                'port': os.getenv('PGPORT'),
-                'user': os.getenv('PGUSER'),
-                'password': os.getenv('PGPASSWORD'),
-                'database': os.getenv('PGDATABASE')
-            }
-            env['PGPASSWORD'] = db_params['password']
-
-            # Now perform the actual restore with verbose output
-            st.write("Starting database restore...")
-
-            result = subprocess.run(
-                [
-                    'psql',
-                    '-h', db_params['host'],
-                    '-p', db_params['port'],
-                    '-U', db_params['user'],
-                    '-d', db_params['database'],
-                    '-v', 'ON_ERROR_STOP=1',
-                    '-f', tmp_file_path
-                ],
-                env=env,
-                capture_output=True,
-                text=True
-            )
+            with get_db_session() as connection:
+                swapped = swap_staging(connection)
+            break
+        except OperationalError as e:
+            if attempt == SWAP_ATTEMPTS:
+                raise
+            job.log.append(f"Swap attempt {attempt} could not lock the live tables, retrying: {e.orig}")
+            time.sleep(attempt)
+    job.log.append(f"Swapped in: {', '.join(swapped)}")
+
+    # Invalidate every cache keyed on the restored data
+    bump_data_generation(LANGUAGES, PAIRS)
+
+def _discard_restore(job):
+    """Drop whatever is left in the staging schema."""
+    with get_db_session() as connection:
+        drop_staging(connection)
+
+@st.fragment(run_every=1)
+def render_restore_progress():
+    """Poll the session's restore job and show its progress until it finishes."""
+    job = st.session_state.get('restore_job')
+    if job is None:
+        return
+
+    st.progress(job.progress, text=f"{job.name}: {job.stage} ({job.elapsed:.0f}s)")
+    with st.expander("Restore log", expanded=job.status == 'failed'):
+        st.code('\n'.join(job.log) or "No output yet.")
 
-            if result.returncode == 0:
-                st.success("Database backup restored successfully!")
-                # Verify the restoration
-                verify_queries = [
-                    """SELECT COUNT(*) as total_rows, 
-                       COUNT(DISTINCT source_lang_id) as unique_sources,
-                       COUNT(DISTINCT target_lang_id) as unique_targets
-                    FROM nmt_pairs_source;"""
-                ]
-
-                st.write("Post-restore database state:")
-                for query in verify_queries:
-                    verify_result = subprocess.run(
-                        ['psql',
-                         '-h', db_params['host'],
-                         '-p', db_params['port'],
-                         '-U', db_params['user'],
-                         '-d', db_params['database'],
-                         '-c', query
-                        ],
-                        env=env,
-                        capture_output=True,
-                        text=True
-                    )
-                    st.code(verify_result.stdout)
-
-            else:
-                st.error("Error restoring backup. Details:")
-                st.code(result.stderr)
-                st.write("Command output:")
-                st.code(result.stdout)
-
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
-            st.write("Full error details:", str(e))
-        finally:
-            # Clean up the temporary file
-            if 'tmp_file_path' in locals():
-                os.unlink(tmp_file_path)
\ No newline at end of file
+    if not job.done:
+        return
+    if job.status == 'succeeded':
+        st.success(f"Database backup restored successfully in {job.elapsed:.0f}s!")
+    else:
+        st.error(f"Error restoring backup: {job.error}")
+
+    # Rerun the whole page once so it picks up the new data generation
+    if not st.session_state.get('restore_job_reported'):
+        st.session_state.restore_job_reported = True
+        st.rerun()
+
+def handle_backup_upload():
+    """Handle the upload of a PostgreSQL database backup file.
+
+    The file is saved to disk in chunks and loaded by a background job into a
+    staging schema, then validated and swapped in atomically, so the live
+    tables keep serving until the new dataset is complete.
+    """
+    uploaded_file = st.file_uploader(
+        "Choose a PostgreSQL backup file (plain SQL or pg_dump custom/tar archive)"
+    )
+
+    job = st.session_state.get('restore_job')
+    if uploaded_file is not None and uploaded_file.file_id != st.session_state.get('restore_upload_id'):
+        if job is not None and not job.done:
+            st.warning("A restore is already running; wait for it to finish before uploading another backup.")
+        else:
+            try:
+                path = save_upload(uploaded_file)
+                job = RestoreJob(
+                    path,
+                    before=_prepare_restore,
+                    after=_publish_restore,
+                    cleanup=_discard_restore,
+                    name=uploaded_file.name
+                ).start()
+                st.session_state.restore_job = job
+                st.session_state.restore_upload_id = uploaded_file.file_id
+                st.session_state.restore_job_reported = False
+                st.write(f"Restoring {job.format} backup of {job.size / 1024 / 1024:.1f} MB...")
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
+
+    render_restore_progress()
+
+def handle_scores_upload():
+    """Handle the upload of a file of new evaluation scores for nmt_pairs_source."""
+    uploaded_file = st.file_uploader(
+        "Import evaluation scores (CSV or Parquet with Source, Target and chrf_plus columns)",
+        type=['csv', 'parquet'],
+        key='scores-upload'
+    )
+    if uploaded_file is None or uploaded_file.file_id == st.session_state.get('scores_upload_id'):
+        return
+
+    st.session_state.scores_upload_id = uploaded_file.file_id
+    try:
+        with st.spinner("Importing scores..."):
+            summary = import_score_file(uploaded_file)
+        st.success(
+            f"Imported {summary['rows']} rows: {summary['updated']} updated, "
+            f"{summary['inserted']} inserted, {summary['linked']} linked to both languages."
+        )
+        if summary['unresolved_codes']:
+            st.warning(f"Codes without a matching language: {', '.join(summary['unresolved_codes'])}")
+        if summary['ambiguous_codes']:
+            st.warning(
+                f"Codes matching several languages (lowest id used): {', '.join(summary['ambiguous_codes'])}"
+            )
+        if summary['skipped_pairs']:
+            st.warning(f"Skipped pairs resolving to one language: {', '.join(summary['skipped_pairs'])}")
+    except Exception as e:
+        st.error(f"Error importing scores: {str(e)}")
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Direction of an edge, seen from the language that owns it
+SOURCE = 0
+TARGET = 1
+
+class EdgeIndex:
+    """Each language's translation pairs as aligned flat arrays with CSR offsets.
+
+    Built from a PairStore's per-language index and the coordinates in the
+    language frame. Edge i belongs to language index_ids[edge_owner[i]] and
+    has partner_ids[i], the partner's latitudes[i] and longitudes[i] (NaN
+    when the partner is not on the map), chrf[i], bleu[i] and direction[i]
+    (SOURCE when the owner is the pair's source). A language's edges are the
+    slice offsets[k]:offsets[k + 1], sources before targets, best chrF++
+    first, so every column stays aligned and is read with plain slicing.
+    """
+
+    def __init__(self, store, languages):
+        self.index_ids = store.index_ids
+        self.offsets = store.offsets
+
+        rows = store.edge_row
+        self.direction = store.edge_role
+        self.partner_ids = np.where(self.direction == SOURCE, store.target_ids[rows], store.source_ids[rows])
+        self.chrf = store.chrf[rows]
+        self.bleu = store.bleu[rows]
+        self.edge_owner = np.repeat(
+            np.arange(len(self.index_ids), dtype=np.int32), np.diff(self.offsets)
+        )
+
+        located = languages[languages['latitude'].notna() & languages['longitude'].notna()].sort_values('id')
+        self._located_ids = located['id'].to_numpy(dtype=np.int64)
+        self._located_lat = located['latitude'].to_numpy(dtype=np.float64)
+        self._located_lon = located['longitude'].to_numpy(dtype=np.float64)
+
+        self.latitudes, self.longitudes = self.coordinates(self.partner_ids)
+        self.owner_latitudes, self.owner_longitudes = self.coordinates(self.index_ids)
+
+    def coordinates(self, ids):
+        """Latitude and longitude arrays for language ids, NaN where not on the map."""
+        ids = np.asarray(ids, dtype=np.int64)
+        lat = np.full(len(ids), np.nan)
+        lon = np.full(len(ids), np.nan)
+        if len(self._located_ids) == 0:
+            return lat, lon
+        pos = np.clip(np.searchsorted(self._located_ids, ids), 0, len(self._located_ids) - 1)
+        found = self._located_ids[pos] == ids
+        lat[found] = self._located_lat[pos[found]]
+        lon[found] = self._located_lon[pos[found]]
+        return lat, lon
+
+    def language_slice(self, language_id):
+        """Return the (start, end) range of a language's edges."""
+        pos = np.searchsorted(self.index_ids, language_id)
+        if pos >= len(self.index_ids) or self.index_ids[pos] != language_id:
+            return 0, 0
+        return int(self.offsets[pos]), int(self.offsets[pos + 1])
+
+    @property
+    def nbytes(self):
+        """Memory held by the index's own arrays, not counting those shared with the store."""
+        arrays = [
+            self.partner_ids, self.chrf, self.bleu, self.edge_owner, self.latitudes, self.longitudes,
+            self.owner_latitudes, self.owner_longitudes, self._located_ids, self._located_lat, self._located_lon
+        ]
+        return int(sum(a.nbytes for a in arrays))
@@ -0,0 +1,65 @@
+import io
+import streamlit as st
+from database import LANGUAGES, PAIRS, data_generation, get_pair_store
+
+# Download formats: file extension and MIME type
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow IPC': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+def serialize_frame(df, fmt):
+    """Serialize a DataFrame to bytes in one of the EXPORT_FORMATS."""
+    if fmt == 'CSV':
+        return df.to_csv(index=False).encode('utf-8')
+
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    buffer = io.BytesIO()
+    if fmt == 'Parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, buffer, compression='zstd')
+    else:
+        with pa.ipc.new_file(buffer, table.schema) as writer:
+            writer.write_table(table)
+    return buffer.getvalue()
+
+@st.cache_data(max_entries=16)
+def build_pairs_export(generation, search, sort_by, ascending, fmt):
+    """Serialized all-pairs table for one data generation and filter."""
+    store = get_pair_store()
+    return serialize_frame(store.rows_frame(store.matching_rows(search, sort_by, ascending)), fmt)
+
+@st.cache_data(max_entries=16)
+def build_language_pairs_export(generation, language_id, fmt):
+    """Serialized translation pairs of one language for one data generation."""
+    return serialize_frame(get_pair_store().language_pairs(language_id), fmt)
+
+def render_export(key, file_stem, build, *filters):
+    """Render an export panel that serializes only after the user asks for a file.
+
+    build is called as build(generation, *filters, fmt) and should be cached.
+    A prepared file stays offered until the filters or data generation change.
+    """
+    generation = data_generation(LANGUAGES, PAIRS)
+    col1, col2 = st.columns([0.3, 0.7])
+    with col1:
+        fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{key}-format")
+    signature = (generation, filters, fmt)
+
+    with col2:
+        if st.session_state.get(key) != signature:
+            if st.button("Prepare download", key=f"{key}-prepare"):
+                st.session_state[key] = signature
+                st.rerun()
+            return
+
+        extension, mime = EXPORT_FORMATS[fmt]
+        st.download_button(
+            f"📥 Download {fmt}",
+            build(generation, *filters, fmt),
+            f"{file_stem}.{extension}",
+            mime,
+            key=f"{key}-download"
+        )
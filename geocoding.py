@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+from sqlalchemy import text
+from database import get_db_session, ensure_schema, offline_mode
+
+# Coordinates are rounded to this many decimals (about 1 km) for the cache key
+COORDINATE_PRECISION = 2
+
+# Nominatim's usage policy allows at most one request per second
+DEFAULT_DELAY_SECONDS = 1.0
+
+class NominatimResolver:
+    """Reverse geocoder backed by the OpenStreetMap Nominatim API."""
+
+    url = "https://nominatim.openstreetmap.org/reverse"
+
+    def __init__(self, timeout=5, user_agent="inclusiveai-map"):
+        self.timeout = timeout
+        self.user_agent = user_agent
+
+    def __call__(self, lat, lon):
+        """Return (city, country) for a point; raises on network errors."""
+        query = urllib.parse.urlencode({'format': 'jsonv2', 'lat': lat, 'lon': lon, 'zoom': 10})
+        request = urllib.request.Request(f"{self.url}?{query}", headers={'User-Agent': self.user_agent})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            address = json.load(response).get('address', {})
+        city = next(
+            (address[k] for k in ('city', 'town', 'village', 'county', 'state') if address.get(k)),
+            None
+        )
+        return city, address.get('country')
+
+class OfflineResolver:
+    """Resolver for offline environments and tests: never leaves the process.
+
+    Points it does not know raise LookupError, like a failed request, so
+    they are not cached as empty and a later online run still resolves them.
+    """
+
+    def __init__(self, locations=None):
+        self.locations = locations or {}
+
+    def __call__(self, lat, lon):
+        key = cache_key(lat, lon)
+        if key not in self.locations:
+            raise LookupError(f"no offline location for {key}")
+        return self.locations[key]
+
+_resolver = None
+
+def get_resolver():
+    """Return the active resolver, chosen by the GEOCODER environment variable."""
+    global _resolver
+    if _resolver is None:
+        _resolver = OfflineResolver() if os.getenv('GEOCODER') == 'offline' else NominatimResolver()
+    return _resolver
+
+def set_resolver(resolver):
+    """Swap the resolver, e.g. for a local stand-in; any callable(lat, lon) works."""
+    global _resolver
+    _resolver = resolver
+
+def cache_key(lat, lon):
+    """Rounded coordinates identifying a geocode cache entry."""
+    return round(float(lat), COORDINATE_PRECISION), round(float(lon), COORDINATE_PRECISION)
+
+def read_cached_location(connection, lat, lon):
+    """Return the cached (city, country) for a point, or None on a miss."""
+    lat_key, lon_key = cache_key(lat, lon)
+    row = connection.execute(text("""
+        SELECT city, country FROM geocode_cache
+        WHERE lat_key = :lat_key AND lon_key = :lon_key
+        """), {'lat_key': lat_key, 'lon_key': lon_key}).first()
+    return tuple(row) if row else None
+
+def store_location(connection, lat, lon, city, country):
+    """Insert or replace the cached location for a point."""
+    lat_key, lon_key = cache_key(lat, lon)
+    connection.execute(text("""
+        INSERT INTO geocode_cache (lat_key, lon_key, city, country)
+        VALUES (:lat_key, :lon_key, :city, :country)
+        ON CONFLICT (lat_key, lon_key) DO UPDATE SET
+            city = EXCLUDED.city,
+            country = EXCLUDED.country,
+            resolved_at = now()
+        """), {'lat_key': lat_key, 'lon_key': lon_key, 'city': city, 'country': country})
+
+def lookup_location(lat, lon, geo_center=None):
+    """Get (city, country) for a point from geo_center and the cache, resolving on a miss.
+
+    A curated geo_center wins over the resolved city. Resolver failures
+    return what is known so far and are not cached, so a later call retries.
+    """
+    geo_center = geo_center.strip() if isinstance(geo_center, str) and geo_center.strip() else None
+    if offline_mode():
+        # No cache table without a database; only the curated center is known
+        return geo_center, None
+
+    ensure_schema()
+    with get_db_session() as connection:
+        cached = read_cached_location(connection, lat, lon)
+    if cached is not None:
+        city, country = cached
+        return geo_center or city, country
+
+    try:
+        city, country = get_resolver()(lat, lon)
+    except Exception:
+        return geo_center, None
+
+    with get_db_session() as connection:
+        store_location(connection, lat, lon, city, country)
+    return geo_center or city, country
+
+def backfill_geocodes(delay=DEFAULT_DELAY_SECONDS, limit=None, update_geo_center=False, log=print):
+    """Resolve and cache the location of every language missing from the cache.
+
+    Requests are spaced by delay seconds. With update_geo_center, the resolved
+    city is also written to language_new.geo_center where that is empty.
+    Returns the number of points resolved.
+    """
+    ensure_schema()
+    with get_db_session() as connection:
+        rows = connection.execute(text("""
+            SELECT DISTINCT
+                round(ST_Y(l.coordinates::geometry)::numeric, :precision)::float8 AS lat,
+                round(ST_X(l.coordinates::geometry)::numeric, :precision)::float8 AS lon
+            FROM language_new l
+            LEFT JOIN geocode_cache gc
+                ON gc.lat_key = round(ST_Y(l.coordinates::geometry)::numeric, :precision)
+                AND gc.lon_key = round(ST_X(l.coordinates::geometry)::numeric, :precision)
+            WHERE l.coordinates IS NOT NULL
+                AND ST_IsValid(l.coordinates::geometry)
+                AND gc.lat_key IS NULL
+            """), {'precision': COORDINATE_PRECISION}).all()
+
+    if limit is not None:
+        rows = rows[:limit]
+
+    resolver = get_resolver()
+    resolved = 0
+    for i, (lat, lon) in enumerate(rows):
+        if i:
+            time.sleep(delay)
+        try:
+            city, country = resolver(lat, lon)
+        except Exception as e:
+            log(f"({lat}, {lon}): failed: {e}")
+            continue
+
+        with get_db_session() as connection:
+            store_location(connection, lat, lon, city, country)
+            if update_geo_center and city:
+                connection.execute(text("""
+                    UPDATE language_new SET geo_center = :city
+                    WHERE COALESCE(btrim(geo_center), '') = ''
+                        AND round(ST_Y(coordinates::geometry)::numeric, :precision) = :lat
+                        AND round(ST_X(coordinates::geometry)::numeric, :precision) = :lon
+                    """), {'city': city, 'lat': lat, 'lon': lon, 'precision': COORDINATE_PRECISION})
+        resolved += 1
+        log(f"({lat}, {lon}): {city or '-'}, {country or '-'}")
+    return resolved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the geocode cache for every language.")
+    parser.add_argument('--delay', type=float, default=DEFAULT_DELAY_SECONDS,
+                        help="seconds between resolver requests")
+    parser.add_argument('--limit', type=int, help="resolve at most this many points")
+    parser.add_argument('--update-geo-center', action='store_true',
+                        help="also write the resolved city to empty language_new.geo_center values")
+    args = parser.parse_args()
+
+    count = backfill_geocodes(args.delay, args.limit, args.update_geo_center)
+    print(f"Resolved {count} locations.")
@@ -0,0 +1,209 @@
+import argparse
+import io
+import os
+import pandas as pd
+from sqlalchemy import text
+
+# Columns of an evaluation file; Source and Target are FLORES codes such as
+# 'twi_Latn', whose part before the underscore is the ISO 639-3 code.
+CODE_COLUMNS = ['Source', 'Target']
+SCORE_COLUMNS = ['chrf_plus', 'spbleu_spm_200', 'spbleu_spm_100']
+IMPORT_COLUMNS = CODE_COLUMNS + SCORE_COLUMNS + ['source_lang_id', 'target_lang_id']
+
+IMPORT_TABLE_SQL = """
+    CREATE TEMP TABLE nmt_scores_import (
+        "Source" varchar(50) NOT NULL,
+        "Target" varchar(50) NOT NULL,
+        chrf_plus numeric(5, 2),
+        spbleu_spm_200 numeric(5, 2),
+        spbleu_spm_100 numeric(5, 2),
+        source_lang_id integer,
+        target_lang_id integer
+    ) ON COMMIT DROP
+    """
+
+# Set-based merge keyed on the code pair. Ids already linked by hand, and
+# scores the file leaves blank or omits, are kept rather than set to NULL.
+MERGE_SQL = [
+    """
+    UPDATE nmt_pairs_source p SET
+        chrf_plus = COALESCE(i.chrf_plus, p.chrf_plus),
+        spbleu_spm_200 = COALESCE(i.spbleu_spm_200, p.spbleu_spm_200),
+        spbleu_spm_100 = COALESCE(i.spbleu_spm_100, p.spbleu_spm_100),
+        source_lang_id = COALESCE(i.source_lang_id, p.source_lang_id),
+        target_lang_id = COALESCE(i.target_lang_id, p.target_lang_id)
+    FROM nmt_scores_import i
+    WHERE p."Source" = i."Source" AND p."Target" = i."Target"
+    """,
+    # Dumps may ship the id sequence behind the table's ids
+    """
+    SELECT setval(
+        pg_get_serial_sequence('nmt_pairs_source', 'id'),
+        GREATEST((SELECT max(id) FROM nmt_pairs_source), 1)
+    )
+    """,
+    """
+    INSERT INTO nmt_pairs_source (
+        "Source", "Target", chrf_plus, spbleu_spm_200, spbleu_spm_100, source_lang_id, target_lang_id
+    )
+    SELECT
+        i."Source", i."Target", i.chrf_plus, i.spbleu_spm_200, i.spbleu_spm_100,
+        i.source_lang_id, i.target_lang_id
+    FROM nmt_scores_import i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM nmt_pairs_source p
+        WHERE p."Source" = i."Source" AND p."Target" = i."Target"
+    )
+    """,
+]
+
+def read_scores(source, fmt=None):
+    """Read an evaluation file (CSV or Parquet) into a frame of IMPORT columns.
+
+    source is a path or a file object; fmt is 'csv' or 'parquet' and defaults
+    to the file extension. Rows without both codes are dropped, scores are
+    rounded to the column precision, and a code pair listed twice keeps its
+    last row. Scores that are blank or missing from the file are NULL and
+    leave an existing pair's stored score unchanged.
+    """
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    fmt = fmt or ('parquet' if name.lower().endswith(('.parquet', '.pq')) else 'csv')
+    scores = pd.read_parquet(source) if fmt == 'parquet' else pd.read_csv(source)
+
+    missing = [column for column in CODE_COLUMNS + SCORE_COLUMNS[:1] if column not in scores]
+    if missing:
+        raise ValueError(f"Evaluation file is missing columns: {', '.join(missing)}")
+
+    scores = scores.reindex(columns=CODE_COLUMNS + SCORE_COLUMNS)
+    for column in CODE_COLUMNS:
+        scores[column] = scores[column].astype('string').str.strip()
+    for column in SCORE_COLUMNS:
+        scores[column] = pd.to_numeric(scores[column], errors='coerce').round(2)
+    scores = scores.dropna(subset=CODE_COLUMNS)
+    scores = scores[(scores['Source'] != '') & (scores['Target'] != '')]
+    return scores.drop_duplicates(CODE_COLUMNS, keep='last').reset_index(drop=True)
+
+def resolve_language_ids(scores, languages):
+    """Add source_lang_id and target_lang_id by ISO code, as one hash join per side.
+
+    languages has id and iso_code columns. When several languages share an
+    ISO code the lowest id wins; codes with no match get NULL ids, like most
+    of the shipped pairs.
+    """
+    iso_to_id = (
+        languages.dropna(subset=['iso_code'])
+        .assign(iso_code=lambda df: df['iso_code'].str.strip().str.lower())
+        .sort_values('id')
+        .drop_duplicates('iso_code')
+        .set_index('iso_code')['id']
+    )
+    resolved = scores.copy()
+    for column, id_column in zip(CODE_COLUMNS, ['source_lang_id', 'target_lang_id']):
+        resolved[id_column] = iso_codes(resolved[column]).map(iso_to_id).astype('Int64')
+    return resolved
+
+def iso_codes(codes):
+    """Lower-case ISO prefix of FLORES codes, e.g. ace_Arab -> ace."""
+    return codes.str.partition('_')[0].str.lower()
+
+def ambiguous_codes(resolved, languages):
+    """Codes in the file whose ISO prefix matches more than one language."""
+    shared = languages['iso_code'].dropna().str.strip().str.lower().value_counts()
+    shared = set(shared.index[shared > 1])
+    codes = pd.concat([resolved['Source'], resolved['Target']]).drop_duplicates()
+    return sorted(codes[iso_codes(codes).isin(shared)])
+
+def same_language_rows(resolved):
+    """Rows whose two codes resolve to the same language, e.g. ace_Arab and ace_Latn.
+
+    Importing them would add self-pairs and let one script's scores stand
+    in for the other's.
+    """
+    return (
+        resolved['source_lang_id'].notna()
+        & (resolved['source_lang_id'] == resolved['target_lang_id'])
+    ).fillna(False).to_numpy(dtype=bool)
+
+def copy_scores(connection, scores):
+    """Load resolved scores into the nmt_scores_import temp table with COPY."""
+    connection.execute(text(IMPORT_TABLE_SQL))
+    buffer = io.StringIO()
+    scores[IMPORT_COLUMNS].to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+    columns = ', '.join(f'"{column}"' for column in IMPORT_COLUMNS)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY nmt_scores_import ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def merge_scores(connection):
+    """Update existing pairs and insert new ones from nmt_scores_import.
+
+    Returns (updated, inserted) row counts.
+    """
+    updated = connection.execute(text(MERGE_SQL[0])).rowcount
+    connection.execute(text(MERGE_SQL[1]))
+    inserted = connection.execute(text(MERGE_SQL[2])).rowcount
+    return updated, inserted
+
+def import_scores(connection, scores):
+    """Resolve, COPY and merge a frame from read_scores in the current transaction.
+
+    Rows whose codes resolve to the same language are skipped. Returns a
+    summary dict with row counts, the skipped rows' code pairs, and the codes
+    that did not resolve or matched several languages.
+    """
+    languages = pd.read_sql(text("SELECT id, iso_code FROM language_new"), connection)
+    resolved = resolve_language_ids(scores, languages)
+    same = same_language_rows(resolved)
+    skipped = resolved[same]
+    resolved = resolved[~same].reset_index(drop=True)
+    copy_scores(connection, resolved)
+    updated, inserted = merge_scores(connection)
+
+    unresolved = pd.concat([
+        resolved.loc[resolved['source_lang_id'].isna(), 'Source'],
+        resolved.loc[resolved['target_lang_id'].isna(), 'Target'],
+    ]).unique()
+    return {
+        'rows': len(resolved),
+        'updated': updated,
+        'inserted': inserted,
+        'linked': int((resolved['source_lang_id'].notna() & resolved['target_lang_id'].notna()).sum()),
+        'unresolved_codes': sorted(unresolved),
+        'ambiguous_codes': ambiguous_codes(pd.concat([resolved, skipped]), languages),
+        'skipped_pairs': [f"{source}→{target}" for source, target in zip(skipped['Source'], skipped['Target'])],
+    }
+
+def import_score_file(source, fmt=None):
+    """Import an evaluation file, refresh the connection views and invalidate caches."""
+    from database import PAIRS, bump_data_generation, ensure_schema, get_db_session, refresh_language_snapshot
+
+    scores = read_scores(source, fmt)
+    ensure_schema()
+    with get_db_session() as connection:
+        summary = import_scores(connection, scores)
+    refresh_language_snapshot()
+    bump_data_generation(PAIRS)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import FLORES evaluation scores into nmt_pairs_source.")
+    parser.add_argument('file', help="CSV or Parquet file with Source, Target, chrf_plus, "
+                                     "and optionally spbleu_spm_200 and spbleu_spm_100 columns")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="file format (default: from the extension)")
+    args = parser.parse_args()
+
+    summary = import_score_file(args.file, args.format)
+    print(
+        f"Imported {summary['rows']} rows from {os.path.basename(args.file)}: "
+        f"{summary['updated']} updated, {summary['inserted']} inserted, "
+        f"{summary['linked']} linked to both languages."
+    )
+    if summary['unresolved_codes']:
+        print(f"Codes without a matching language: {', '.join(summary['unresolved_codes'])}")
+    if summary['ambiguous_codes']:
+        print(f"Codes matching several languages (lowest id used): {', '.join(summary['ambiguous_codes'])}")
+    if summary['skipped_pairs']:
+        print(f"Skipped pairs resolving to one language: {', '.join(summary['skipped_pairs'])}")
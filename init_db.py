@@ -1,19 +1,53 @@
-from sqlalchemy import create_engine
-from models import Base
+import argparse
 import os
+from sqlalchemy import create_engine
+from migrations import DATASET_BASE_TABLES, dataset_tables_exist, run_migrations, check_query_plans
 
-def init_database():
-    """Initialize database tables."""
+def get_engine():
+    """Create a database engine from the environment."""
     connection_string = os.getenv('DATABASE_URL')
     if not connection_string:
         connection_string = (
             f"postgresql://{os.getenv('PGUSER')}:{os.getenv('PGPASSWORD')}@"
             f"{os.getenv('PGHOST')}:{os.getenv('PGPORT')}/{os.getenv('PGDATABASE')}"
         )
-    
-    engine = create_engine(connection_string)
-    Base.metadata.create_all(engine)
-    print("Database tables created successfully!")
+    return create_engine(connection_string)
+
+def init_database(reapply_dataset=False):
+    """Apply pending schema migrations; return False if the dataset tables are missing."""
+    engine = get_engine()
+    with engine.begin() as connection:
+        ran = run_migrations(connection, reapply_dataset=reapply_dataset)
+        restored = dataset_tables_exist(connection)
+
+    if ran:
+        for migration in ran:
+            print(f"Applied migration {migration.version}: {migration.name}")
+    else:
+        print("Database schema is up to date.")
+    if not restored:
+        print(f"Dataset migrations are pending: restore a dump providing {', '.join(DATASET_BASE_TABLES)} first.")
+    return restored
+
+def check_database():
+    """Verify the hot queries can use their indexes; return True when all do."""
+    engine = get_engine()
+    with engine.begin() as connection:
+        results = check_query_plans(connection)
+
+    for name, expected_index, ok, used in results:
+        status = "OK  " if ok else "FAIL"
+        print(f"{status} {name}: expected {expected_index}, plan uses {', '.join(used) or 'no index'}")
+    return all(ok for _, _, ok, _ in results)
 
 if __name__ == "__main__":
-    init_database()
+    parser = argparse.ArgumentParser(description="Migrate the Inclusive AI Map database.")
+    parser.add_argument('--reapply', action='store_true',
+                        help="re-run dataset migrations, e.g. after restoring a backup by hand")
+    parser.add_argument('--check', action='store_true',
+                        help="EXPLAIN the hot queries and verify they use their indexes")
+    args = parser.parse_args()
+
+    restored = init_database(reapply_dataset=args.reapply)
+    if args.check and (not restored or not check_database()):
+        raise SystemExit(1)
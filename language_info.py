@@ -1,61 +1,19 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import altair as alt
-from database import get_database_connection
-import trafilatura
+from database import (
+    get_database_connection, get_language_nmt_pairs, offline_mode, get_offline_dataset, get_pivot_router,
+    get_score_matrix
+)
+from routing import MAX_HOPS
 import urllib.parse
-
-@st.cache_data
-def get_language_nmt_pairs(language_id):
-    """Get NMT pairs for a specific language."""
-    engine = get_database_connection()
-    query = """
-    SELECT 
-        nps.chrf_plus as chrf_score,
-        nps.spbleu_spm_200 as bleu_score,
-        source_lang.lang_name AS source_language,
-        target_lang.lang_name AS target_language,
-        CASE 
-            WHEN source_lang.id = %(lang_id)s THEN 'Source'
-            ELSE 'Target'
-        END as role
-    FROM 
-        nmt_pairs_source nps
-    LEFT JOIN 
-        language_new AS source_lang 
-    ON 
-        nps.source_lang_id = source_lang.id
-    LEFT JOIN 
-        language_new AS target_lang 
-    ON 
-        nps.target_lang_id = target_lang.id
-    WHERE 
-        nps.source_lang_id IS NOT NULL
-        AND nps.target_lang_id IS NOT NULL
-        AND (source_lang.id = %(lang_id)s OR target_lang.id = %(lang_id)s)
-    ORDER BY 
-        role, nps.chrf_plus DESC NULLS LAST;
-    """
-    return pd.read_sql_query(query, engine, params={'lang_id': language_id})
-
-def get_location_from_coordinates(lat, lon):
-    """Get location information from coordinates using OpenStreetMap Nominatim."""
-    try:
-        url = f"https://nominatim.openstreetmap.org/reverse?format=xml&lat={lat}&lon={lon}"
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            location_text = trafilatura.extract(downloaded)
-            if location_text:
-                parts = [part.strip() for part in location_text.split(',')]
-                city = parts[0] if parts else None
-                country = parts[-1].strip() if len(parts) > 1 else None
-                return city, country
-    except Exception:
-        return None, None
-    return None, None
+from exports import render_export, build_language_pairs_export
+from geocoding import lookup_location
 
 def create_score_chart(nmt_pairs):
     """Create an interactive chart for NMT pair scores."""
+    import altair as alt
+
     # Prepare data for visualization
     chart_data = pd.melt(
         nmt_pairs,
@@ -88,6 +46,8 @@ def create_score_chart(nmt_pairs):
 
 def get_language_details(language_id):
     """Fetch detailed information about a specific language."""
+    if offline_mode():
+        return get_offline_dataset().language_details(language_id)
     engine = get_database_connection()
     query = """
     SELECT 
@@ -105,6 +65,7 @@ def get_language_details(language_id):
         ln.asr_url,
         ln.nmt_url,
         ln.tts_url,
+        ln.geo_center,
         ST_Y(ST_AsText(ln.coordinates::geometry)) as latitude,
         ST_X(ST_AsText(ln.coordinates::geometry)) as longitude
     FROM language_new ln
@@ -120,6 +81,8 @@ def get_language_details(language_id):
 
 def get_family_languages(family_id):
     """Fetch all languages belonging to a specific language family."""
+    if offline_mode():
+        return get_offline_dataset().family_languages(family_id)
     engine = get_database_connection()
     query = """
     SELECT lang_name as name, id
@@ -131,6 +94,8 @@ def get_family_languages(family_id):
 
 def get_subfamily_languages(subfamily_id):
     """Fetch all languages belonging to a specific language subfamily."""
+    if offline_mode():
+        return get_offline_dataset().subfamily_languages(subfamily_id)
     engine = get_database_connection()
     query = """
     SELECT lang_name as name, id
@@ -140,6 +105,75 @@ def get_subfamily_languages(subfamily_id):
     """
     return pd.read_sql_query(query, engine, params={'subfamily_id': subfamily_id})
 
+# Hop limits offered for pivot routes, with None for no limit
+HOP_LABELS = {1: "Direct only", 2: "One pivot", 3: "Two pivots", None: "Any number"}
+
+def render_pivot_routes(language_id):
+    """Render the best weakest-link routes from a language to the others.
+
+    st.tabs runs every tab, so the score matrix and route tables are only
+    built once the user asks for routes from this language.
+    """
+    if st.session_state.get('pivot-routes') != language_id:
+        st.caption("Find translation routes through pivot languages, ranked by their weakest hop.")
+        if st.button("Find routes", key="pivot-find"):
+            st.session_state['pivot-routes'] = language_id
+            st.rerun()
+        return
+
+    router = get_pivot_router()
+    matrix = get_score_matrix()
+    names = dict(zip(matrix.ids.tolist(), matrix.names(range(len(matrix.ids))).tolist()))
+    if language_id not in names:
+        st.info("This language has no linked translation pairs to route through.")
+        return
+
+    st.caption("Routes are ranked by their weakest hop's chrF++ score.")
+    targets = sorted((i for i in names if i != language_id), key=names.get)
+    col1, col2 = st.columns([0.6, 0.4])
+    with col1:
+        target_id = st.selectbox("Translate into", targets, format_func=names.get, key="pivot-target")
+    with col2:
+        hop_options = [h for h in HOP_LABELS if h is None or h <= MAX_HOPS]
+        max_hops = st.selectbox("Hops", hop_options, index=1, format_func=HOP_LABELS.get, key="pivot-hops")
+
+    route = router.best_route(language_id, target_id, max_hops)
+    if route is None:
+        st.info(f"No route to {names[target_id]} within this hop limit.")
+    else:
+        st.markdown("**Route:** " + " → ".join(names[i] for i in route.path))
+        metric_col1, metric_col2 = st.columns(2)
+        with metric_col1:
+            st.metric("Weakest hop chrF++", f"{route.bottleneck:.2f}")
+        with metric_col2:
+            direct = router.best_route(language_id, target_id, 1)
+            st.metric("Direct chrF++", f"{direct.bottleneck:.2f}" if direct else "None")
+        st.caption("Hop scores: " + ", ".join(f"{score:.2f}" for score in route.hop_scores))
+
+    # Every language without a direct pair, ranked by its best route
+    st.markdown("### Best Routes Where No Direct Pair Exists")
+    best = router.route_scores(language_id, max_hops)
+    direct = router.route_scores(language_id, 1)
+    missing = np.flatnonzero(np.isnan(direct) & ~np.isnan(best))
+    missing = missing[np.argsort(-best[missing], kind='stable')]
+    if len(missing) == 0:
+        st.info("Every reachable language already has a direct pair.")
+        return
+    rows = []
+    for pos in missing:
+        target = int(matrix.ids[pos])
+        path = router.best_route(language_id, target, max_hops).path
+        rows.append({
+            'target_language': names[target],
+            'route': " → ".join(names[i] for i in path),
+            'hops': len(path) - 1,
+            'weakest_chrf': best[pos],
+        })
+    st.dataframe(
+        pd.DataFrame(rows).style.format({'weakest_chrf': '{:.2f}'}),
+        use_container_width=True, hide_index=True
+    )
+
 def render_language_info_page(language_id):
     """Render the enhanced language information page with interactive elements."""
     try:
@@ -159,7 +193,7 @@ def render_language_info_page(language_id):
                     st.rerun()
 
         # Tabs for different sections
-        tabs = st.tabs(["Overview", "Language Technology", "Translation Pairs"])
+        tabs = st.tabs(["Overview", "Language Technology", "Translation Pairs", "Pivot Routes"])
 
         # Overview Tab
         with tabs[0]:
@@ -169,7 +203,7 @@ def render_language_info_page(language_id):
                 with st.container():
                     st.markdown("##### 🌐 Location and Geography")
                     if pd.notna(details['latitude']) and pd.notna(details['longitude']):
-                        city, country = get_location_from_coordinates(details['latitude'], details['longitude'])
+                        city, country = lookup_location(details['latitude'], details['longitude'], details['geo_center'])
                         location_text = []
                         if city:
                             location_text.append(city)
@@ -257,17 +291,20 @@ def render_language_info_page(language_id):
                     use_container_width=True
                 )
 
-                # Download button
-                st.download_button(
-                    "📥 Download Translation Pairs Data",
-                    nmt_pairs.to_csv(index=False).encode('utf-8'),
-                    f"translation_pairs_{details['lang_name'].lower().replace(' ', '_')}.csv",
-                    "text/csv",
-                    key='download-pairs'
+                # Download, serialized only on request
+                render_export(
+                    'download-pairs',
+                    f"translation_pairs_{details['lang_name'].lower().replace(' ', '_')}",
+                    build_language_pairs_export,
+                    language_id
                 )
             else:
                 st.info("No translation pairs available for this language.")
 
+        # Pivot Routes Tab
+        with tabs[3]:
+            render_pivot_routes(language_id)
+
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
         st.error("Please check your database connection and try again.")
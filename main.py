@@ -1,29 +1,71 @@
+from collections import namedtuple
+from importlib import import_module
+import pandas as pd
 import streamlit as st
-from database import load_language_data, get_model_types, get_all_nmt_pairs
-from map_utils import display_map
-from components import render_model_filters, render_statistics
+from database import (
+    LANGUAGES, PAIRS, load_language_data, get_model_types, get_pair_store, data_generation,
+    dataset_memory_report, offline_mode
+)
+from pair_store import SORT_COLUMNS
+from components import render_connection_filters, render_model_filters, render_statistics
 from styles import apply_custom_styles
-from language_info import render_language_info_page, render_family_page, render_subfamily_page
-from db_utils import handle_backup_upload
+from exports import render_export, build_pairs_export
+
+# database.load_language_data hands every session a zero-copy view of one
+# shared frame; Copy-on-Write (always on from pandas 3) copies a view's data
+# only if a session modifies it. Set here, in the app, rather than on import
+# of database, so the CLI tools keep pandas' defaults.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+SORT_LABELS = {
+    'chrf_score': 'chrF++ Score',
+    'bleu_score': 'BLEU Score',
+    'source_language': 'Source Language',
+    'target_language': 'Target Language'
+}
 
 def render_nmt_pairs_page():
-    """Render the page showing all NMT pairs."""
+    """Render the page showing all NMT pairs, one page of rows at a time."""
     st.title("Neural Machine Translation Pairs")
 
-    # Get all NMT pairs
-    pairs_df = get_all_nmt_pairs()
+    # Pairs live in the shared in-memory store; only the visible page is materialized
+    render_pairs_table(get_pair_store())
+
+@st.fragment
+def render_pairs_table(store):
+    """Render the pair search, sort and paging controls with the table they drive.
 
+    A fragment, so typing a search or turning a page reruns only this block.
+    """
     # Add search/filter functionality
     search = st.text_input("Search for language pairs", "")
 
-    # Filter based on search
-    if search:
-        pairs_df = pairs_df[
-            pairs_df['source_language'].str.contains(search, case=False) |
-            pairs_df['target_language'].str.contains(search, case=False)
-        ]
+    col1, col2, col3 = st.columns([0.4, 0.3, 0.3])
+    with col1:
+        sort_by = st.selectbox("Sort by", SORT_COLUMNS, format_func=SORT_LABELS.get)
+    with col2:
+        ascending = st.radio("Order", ["Descending", "Ascending"], horizontal=True) == "Ascending"
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+    # Row numbers are cheap; the count bounds the page number before slicing
+    rows = store.matching_rows(search, sort_by, ascending)
+    total = len(rows)
+    page_count = max(1, -(-total // page_size))
+    page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    offset = (page_number - 1) * page_size
+
+    pairs_df = store.rows_frame(rows[offset:offset + page_size])
+
+    st.caption(
+        f"Showing {offset + 1 if total else 0}–{offset + len(pairs_df)} of {total} pairs "
+        f"(page {page_number} of {page_count})"
+    )
 
-    # Display pairs in a sortable table
+    # Style only the visible page
     st.dataframe(
         pairs_df.style.format({
             'chrf_score': '{:.2f}',
@@ -35,15 +77,146 @@ def render_nmt_pairs_page():
         use_container_width=True
     )
 
-    # Add download button
-    st.download_button(
-        "Download as CSV",
-        pairs_df.to_csv(index=False).encode('utf-8'),
-        "nmt_pairs.csv",
-        "text/csv",
-        key='download-nmt-pairs'
+    # Files are built only on request and cached per data generation and filter
+    render_export('download-nmt-pairs', "nmt_pairs", build_pairs_export, search, sort_by, ascending)
+
+def render_diagnostics():
+    """Render memory and cache diagnostics for the shared datasets."""
+    st.markdown("### Shared Dataset Memory")
+    sessions = st.number_input("Concurrent sessions", min_value=1, value=10, step=1)
+    report = dataset_memory_report(sessions)
+
+    mb = 1024 * 1024
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Language frame", f"{report['frame_bytes'] / mb:.2f} MB")
+    with col2:
+        st.metric(
+            f"Held by {sessions} sessions",
+            f"{report['shared_total_bytes'] / mb:.2f} MB",
+            f"-{(report['copied_total_bytes'] - report['shared_total_bytes']) / mb:.2f} MB vs per-session copies",
+            delta_color="inverse"
+        )
+    with col3:
+        st.metric("Unpickling avoided per rerun", f"{report['unpickle_ms_per_rerun']:.1f} ms")
+    st.caption(
+        f"Pair store: {report['pair_store_bytes'] / mb:.2f} MB, "
+        f"edge index: {report['edge_index_bytes'] / mb:.2f} MB, both shared."
     )
 
+    from map_cache import get_map_cache
+
+    st.markdown("### Rendered Map Cache")
+    st.json(get_map_cache().stats())
+
+def render_admin_page():
+    """Render the admin page: backup restore, score import and diagnostics."""
+    # There is no database to restore into offline
+    if not offline_mode():
+        from db_utils import handle_backup_upload, handle_scores_upload
+
+        st.title("Database Backup Upload")
+        handle_backup_upload()
+        handle_scores_upload()
+
+        st.markdown("---")
+
+    render_diagnostics()
+
+def render_map_page(generation, languages, model_types):
+    """Render the statistics row, then the model filters and language map."""
+    # The statistics don't depend on the model selection, so filter changes skip them
+    render_statistics(languages)
+    render_map_view(generation, languages, model_types)
+
+@st.fragment
+def render_map_view(generation, languages, model_types):
+    """Render the model and connection filters and the map they drive.
+
+    A fragment, so toggling a filter reruns only the filters and the map,
+    which comes from the rendered map cache once a selection has been seen.
+    """
+    # folium is only imported once a map is drawn
+    from map_utils import display_map
+
+    map_column, filter_column = st.columns([0.75, 0.25])
+
+    # Filters first, so the map sees this run's selection
+    with filter_column:
+        st.markdown("### Model Types")
+        selected_models = render_model_filters(model_types)
+        st.markdown("### Translation Pairs")
+        connections = render_connection_filters(languages)
+
+    with map_column:
+        display_map(languages, selected_models, connections, generation=generation)
+        if connections is not None:
+            st.caption("Lines are colored by chrF++: grey unscored, red below 20, "
+                       "orange 20–35, yellow-green 35–50, green 50 and above.")
+
+# Shared data a page can declare; only what the routed page needs is loaded.
+# 'generation' is listed before 'languages' so it is read first and keys the
+# rendered map cache.
+DATA_LOADERS = {
+    'generation': lambda: data_generation(LANGUAGES, PAIRS),
+    'languages': load_language_data,
+    'model_types': get_model_types,
+}
+
+def lazy(module, name):
+    """A render function that imports its module on first call.
+
+    Pages backed by altair or folium stay out of a fresh process's import
+    time until someone opens them.
+    """
+    def render(*args, **kwargs):
+        return getattr(import_module(module), name)(*args, **kwargs)
+    return render
+
+# A page: its render function and the DATA_LOADERS it is called with, in order
+Page = namedtuple('Page', ['render', 'needs'])
+
+PAGES = {
+    'map': Page(render_map_page, ('generation', 'languages', 'model_types')),
+    'nmt_pairs': Page(render_nmt_pairs_page, ()),
+    'admin': Page(render_admin_page, ()),
+    'matrix': Page(lazy('analytics', 'render_score_matrix_page'), ()),
+    'nearby': Page(lazy('nearby', 'render_nearby_page'), ('languages', 'model_types')),
+    'family': Page(lazy('language_info', 'render_family_page'), ()),
+    'subfamily': Page(lazy('language_info', 'render_subfamily_page'), ()),
+    'language': Page(lazy('language_info', 'render_language_info_page'), ()),
+}
+
+NAVIGATION = {
+    "Map View": 'map',
+    "NMT Pairs": 'nmt_pairs',
+    "Score Matrix": 'matrix',
+    "Nearby Languages": 'nearby',
+    "Database Upload": 'admin',
+}
+
+def route():
+    """Pick this run's page from the sidebar, deep-link parameters and session.
+
+    Returns the PAGES key and the positional arguments for its render function.
+    """
+    page = NAVIGATION[st.sidebar.radio("Navigate to", list(NAVIGATION), index=0, key='page')]
+    if page != 'map':
+        return page, ()
+
+    params = st.query_params
+    if 'family_id' in params:
+        return 'family', (int(params['family_id']),)
+    if 'subfamily_id' in params:
+        return 'subfamily', (int(params['subfamily_id']),)
+
+    if 'selected_language' in params:
+        st.session_state.selected_language = int(params['selected_language'])
+        del st.query_params['selected_language']
+    if st.session_state.selected_language is not None:
+        return 'language', (st.session_state.selected_language,)
+    return 'map', ()
+
 def main():
     st.set_page_config(
         page_title="Language Model Availability Dashboard",
@@ -60,64 +233,14 @@ def main():
         st.session_state.selected_language = None
 
     try:
-        # Handle backup upload
-        st.title("Database Backup Upload")
-        handle_backup_upload()
-
-        st.markdown("---")
-
-        # Add navigation
-        page = st.sidebar.radio(
-            "Navigate to",
-            ["Map View", "NMT Pairs", "Database Upload"],
-            index=0
-        )
-
-        if page == "NMT Pairs":
-            render_nmt_pairs_page()
-            return
-
-        # Load data
-        df = load_language_data()
-        model_types = get_model_types()
-
-        # Handle query parameters for different pages
-        params = st.query_params
-
-        if 'family_id' in params:
-            render_family_page(int(params['family_id']))
-            return
-
-        if 'subfamily_id' in params:
-            render_subfamily_page(int(params['subfamily_id']))
-            return
-
-        if 'selected_language' in params:
-            lang_id = params['selected_language']
-            st.session_state.selected_language = int(lang_id)
-            del st.query_params['selected_language']
-
-        # If a language is selected, show its info page
-        if st.session_state.selected_language is not None:
-            render_language_info_page(st.session_state.selected_language)
-            return
-
-        # Create top container for stats and filters
-        top_container = st.container()
-        with top_container:
-            col1, col2 = st.columns([0.7, 0.3])
-            with col1:
-                render_statistics(df)
-            with col2:
-                st.markdown("### Model Types")
-                selected_models = render_model_filters(model_types)
-
-        # Display map
-        display_map(df, st.session_state.get('selected_models', []))
+        page_key, args = route()
+        page = PAGES[page_key]
+        data = {name: DATA_LOADERS[name]() for name in page.needs}
+        page.render(*args, **data)
 
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
         st.error("Please check your database connection and try again.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+# Rendered maps kept per process: 8 model selections times a few connection views
+MAP_CACHE_SIZE = 64
+
+class MapHtmlCache:
+    """Bounded LRU cache of rendered map documents with hit/miss counters."""
+
+    def __init__(self, max_entries=MAP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """Return the HTML cached under key, calling render() to build it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Render outside the lock so a slow miss doesn't stall other sessions
+        html = render()
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def stats(self):
+        """Counters for monitoring: hits, misses, entries and capacity."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+@st.cache_resource
+def get_map_cache():
+    """Get the process-wide rendered map cache."""
+    return MapHtmlCache()
@@ -0,0 +1,187 @@
+import json
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import MarkerCluster
+from folium.template import Template
+
+def to_js_json(obj):
+    """Serialize obj as JSON that is safe to inline in a <script> block."""
+    return (
+        json.dumps(obj, separators=(',', ':'))
+        .replace('<', '\\u003c')
+        .replace('>', '\\u003e')
+        .replace('&', '\\u0026')
+    )
+
+# Client-side popup renderers. The marker one mirrors create_popup_content in
+# map_utils; both read rows of a compact column table, so popup HTML is only
+# built when a popup is opened.
+POPUP_JS = """
+    function escapeHtml(value) {
+        return String(value).replace(/[&<>"']/g, function(c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    }
+
+    function formatScore(value) {
+        return value === null || value === undefined ? 'N/A' : value.toFixed(2);
+    }
+
+    function languagePopup(table, i) {
+        var models = table.combos[table.models[i]];
+        var badges = models.map(function(model) {
+            return '<span style="background-color: ' + table.colors[model] + '; ' +
+                'color: white; padding: 2px 8px; border-radius: 10px; ' +
+                'margin-right: 5px;">' + model + '</span>';
+        }).join('');
+        var nmtInfo = models.indexOf('NMT') >= 0
+            ? '<p><strong>NMT Pairs:</strong> ' + table.pairs[i] + ' language pairs</p>'
+            : '';
+        return "<div style='width: 250px'>" +
+            '<h4 style="margin-bottom: 8px;">' + escapeHtml(table.name[i]) + '</h4>' +
+            '<p><strong>ISO Code:</strong> ' + escapeHtml(table.iso[i] || 'N/A') + '</p>' +
+            '<p><strong>Available Models:</strong></p>' +
+            "<div style='margin-top: 5px'>" +
+            (badges || '<span style="color: #666;">None available</span>') +
+            '</div>' + nmtInfo +
+            "<div style='margin-top: 10px'>" +
+            '<a href="?selected_language=' + table.id[i] + '" target="_top" style="display: inline-block; ' +
+            'color: white; background-color: #1f77b4; border: none; padding: 4px 12px; ' +
+            'border-radius: 4px; cursor: pointer; font-size: 14px; text-decoration: none;">' +
+            'View Details</a></div></div>';
+    }
+
+    function pairPopup(sourceName, targetName, chrf, bleu) {
+        return "<div style='min-width: 200px; padding: 10px;'>" +
+            "<h4 style='margin-bottom: 10px; color: #2c3e50;'>Translation Pair Details</h4>" +
+            "<div style='margin-bottom: 15px;'>" +
+            '<strong>Source:</strong> ' + escapeHtml(sourceName) + '<br>' +
+            '<strong>Target:</strong> ' + escapeHtml(targetName) + '</div>' +
+            "<div style='background: #f8f9fa; padding: 10px; border-radius: 4px;'>" +
+            "<div style='margin-bottom: 8px;'><strong>Quality Metrics:</strong></div>" +
+            "<div style='display: flex; justify-content: space-between;'>" +
+            '<span>chrF++ Score:</span><span>' + formatScore(chrf) + '</span></div>' +
+            "<div style='display: flex; justify-content: space-between;'>" +
+            '<span>BLEU Score:</span><span>' + formatScore(bleu) + '</span></div>' +
+            '</div></div>';
+    }
+"""
+
+class LanguageMarkerLayer(JSCSSMixin, Layer):
+    """All language markers as one GeoJSON FeatureCollection.
+
+    Each feature carries an index into a shared icon table, so the page holds
+    one copy of each icon's HTML however many languages use it. Popups come
+    either from a 'popup' HTML property or, when a popup table is given, are
+    rendered on open from the table row matching the feature's id. With
+    cluster, markers are grouped at low zoom and shown individually from
+    cluster_until_zoom on.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                {{ this.popup_js }}
+                var table = {{ this.table_json }};
+                var rowById = {};
+                if (table) {
+                    table.id.forEach(function(id, i) { rowById[id] = i; });
+                }
+                var icons = {{ this.icons_json }}.map(function(html) {
+                    return L.divIcon({html: html, iconSize: [24, 24], iconAnchor: [12, 12], className: 'empty'});
+                });
+                {%- if this.cluster %}
+                var group = L.markerClusterGroup({disableClusteringAtZoom: {{ this.cluster_until_zoom }}});
+                {%- else %}
+                var group = L.featureGroup();
+                {%- endif %}
+                L.geoJson({{ this.data_json }}, {
+                    pointToLayer: function(feature, latlng) {
+                        return L.marker(latlng, {icon: icons[feature.properties.icon]});
+                    },
+                    onEachFeature: function(feature, layer) {
+                        if (feature.properties.popup) {
+                            layer.bindPopup(feature.properties.popup, {maxWidth: 300});
+                        } else if (table) {
+                            layer.bindPopup(function() {
+                                return languagePopup(table, rowById[feature.properties.id]);
+                            }, {maxWidth: 300});
+                        }
+                    }
+                }).eachLayer(function(layer) { group.addLayer(layer); });
+                return group;
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, features, icons, popup_table=None, name="Languages", cluster=False, cluster_until_zoom=6):
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = "LanguageMarkerLayer"
+        self.data_json = to_js_json({'type': 'FeatureCollection', 'features': features})
+        self.icons_json = to_js_json(icons)
+        self.table_json = to_js_json(popup_table)
+        self.popup_js = POPUP_JS if popup_table is not None else ''
+        self.cluster = cluster
+        self.cluster_until_zoom = cluster_until_zoom
+        self.default_js = MarkerCluster.default_js if cluster else []
+        self.default_css = MarkerCluster.default_css if cluster else []
+
+class ConnectionLayer(Layer):
+    """Translation pairs as one canvas polyline per score band, with popups built on click.
+
+    edges is a column table with 'source', 'target', 'source_lat',
+    'source_lon', 'lat', 'lon', 'chrf', 'bleu' and 'band' lists; band
+    indexes styles, a list of {'color', 'weight'} dicts. However many edges
+    there are, the map gets len(styles) layers drawn on a shared canvas, and
+    a click opens the popup of the nearest edge in the band clicked.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                {{ this.popup_js }}
+                var edges = {{ this.edges_json }};
+                var styles = {{ this.styles_json }};
+                var renderer = L.canvas({padding: 0.5, tolerance: 4});
+                var group = L.featureGroup();
+                styles.forEach(function(style, band) {
+                    var members = [];
+                    edges.band.forEach(function(b, i) { if (b === band) { members.push(i); } });
+                    if (!members.length) {
+                        return;
+                    }
+                    var line = L.polyline(members.map(function(i) {
+                        return [[edges.source_lat[i], edges.source_lon[i]], [edges.lat[i], edges.lon[i]]];
+                    }), {renderer: renderer, color: style.color, weight: style.weight, opacity: 0.7});
+                    line.on('click', function(e) {
+                        var map = this._map;
+                        var point = map.latLngToLayerPoint(e.latlng);
+                        var best = members[0], bestDistance = Infinity;
+                        members.forEach(function(i) {
+                            var distance = L.LineUtil.pointToSegmentDistance(
+                                point,
+                                map.latLngToLayerPoint([edges.source_lat[i], edges.source_lon[i]]),
+                                map.latLngToLayerPoint([edges.lat[i], edges.lon[i]])
+                            );
+                            if (distance < bestDistance) {
+                                best = i;
+                                bestDistance = distance;
+                            }
+                        });
+                        L.popup({maxWidth: 300}).setLatLng(e.latlng).setContent(
+                            pairPopup(edges.source[best], edges.target[best], edges.chrf[best], edges.bleu[best])
+                        ).openOn(map);
+                    });
+                    group.addLayer(line);
+                });
+                return group;
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, edges, styles, name="NMT Connections"):
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = "ConnectionLayer"
+        self.popup_js = POPUP_JS
+        self.edges_json = to_js_json(edges)
+        self.styles_json = to_js_json(styles)
@@ -1,15 +1,17 @@
 import folium
-import streamlit as st
-from streamlit_folium import folium_static
-from folium import plugins
-import pandas as pd
+import streamlit.components.v1 as components
 import numpy as np
-
-def create_base_map():
-    """Create the base map centered on the world view."""
+from database import get_edge_index, get_pair_store
+from edge_index import SOURCE
+from map_cache import get_map_cache
+from map_layers import ConnectionLayer, LanguageMarkerLayer
+from model_mask import MASK_VALUES, mask_to_models, model_masks, selection_mask
+
+def create_base_map(location=(20, 0), zoom_start=2):
+    """Create the base map, centered on the world view by default."""
     return folium.Map(
-        location=[20, 0],
-        zoom_start=2,
+        location=list(location),
+        zoom_start=zoom_start,
         tiles='CartoDB positron'
     )
 
@@ -21,30 +23,21 @@ def get_model_colors():
         'TTS': '#2196F3'
     }
 
-def create_model_indicator_html(available_models, selected_models):
-    """Create HTML for pie-chart style indicators showing available models."""
+def _indicator_html(models_to_show):
+    """Build the pie-chart style indicator for a list of models; grey when empty."""
     colors = get_model_colors()
 
-    # Convert available_models to list and filter out None values
-    models_present = [m for m in (available_models or []) if m is not None]
-
-    if not selected_models:
-        if len(models_present) == 0:
-            return """
-            <div style='
-                width: 24px;
-                height: 24px;
-                background-color: #808080;
-                border-radius: 50%;
-                opacity: 0.4;
-                border: 2px solid white;
-            '></div>
-            """
-        models_to_show = models_present
-    else:
-        models_to_show = [m for m in models_present if m in selected_models]
-        if len(models_to_show) == 0:
-            return None
+    if len(models_to_show) == 0:
+        return """
+        <div style='
+            width: 24px;
+            height: 24px;
+            background-color: #808080;
+            border-radius: 50%;
+            opacity: 0.4;
+            border: 2px solid white;
+        '></div>
+        """
 
     if len(models_to_show) == 1:
         return f"""
@@ -78,90 +71,87 @@ def create_model_indicator_html(available_models, selected_models):
     '></div>
     """
 
-def create_pair_popup_content(source_lang, target_lang, pair_data):
-    """Create HTML content for NMT pair popup."""
-    return f"""
-    <div style='min-width: 200px; padding: 10px;'>
-        <h4 style='margin-bottom: 10px; color: #2c3e50;'>Translation Pair Details</h4>
-        <div style='margin-bottom: 15px;'>
-            <strong>Source:</strong> {source_lang}<br>
-            <strong>Target:</strong> {target_lang}
-        </div>
-        <div style='background: #f8f9fa; padding: 10px; border-radius: 4px;'>
-            <div style='margin-bottom: 8px;'>
-                <strong>Quality Metrics:</strong>
-            </div>
-            <div style='display: flex; justify-content: space-between;'>
-                <span>chrF++ Score:</span>
-                <span>{pair_data.get('chrf_score', 'N/A'):.2f}</span>
-            </div>
-            <div style='display: flex; justify-content: space-between;'>
-                <span>BLEU Score:</span>
-                <span>{pair_data.get('bleu_score', 'N/A'):.2f}</span>
-            </div>
-        </div>
-    </div>
+# The 8 possible marker icons, indexed by the mask of models a marker shows
+MARKER_ICONS = [_indicator_html(mask_to_models(mask)) for mask in range(MASK_VALUES)]
+
+def marker_icon_ids(masks, selected_models):
+    """Index into MARKER_ICONS for each language mask, -1 where the selection hides it."""
+    masks = np.asarray(masks, dtype=np.int8)
+    selected = selection_mask(selected_models)
+    if not selected:
+        return masks
+    shown = masks & selected
+    return np.where(shown != 0, shown, -1).astype(np.int8)
+
+# Connection line styles by chrF++ band: the first is for pairs without a
+# score, then one per CONNECTION_BANDS lower bound
+CONNECTION_BANDS = [0, 20, 35, 50]
+CONNECTION_STYLES = [
+    {'color': '#9e9e9e', 'weight': 1},
+    {'color': '#e53935', 'weight': 1.5},
+    {'color': '#fb8c00', 'weight': 2},
+    {'color': '#c0ca33', 'weight': 3},
+    {'color': '#43a047', 'weight': 4},
+]
+
+def connection_edges(index, store, options):
+    """Column table of the pairs to draw, strongest chrF++ first.
+
+    Edges come from the edge index: one language's, or every pair once, from
+    its source, when options.language_id is None. Self-pairs and pairs with
+    an end off the map are skipped, then options.min_chrf and options.top_k
+    are applied.
     """
+    if options.language_id is None:
+        edges = np.flatnonzero(index.direction == SOURCE)
+    else:
+        edges = np.arange(*index.language_slice(options.language_id))
+
+    owners = index.edge_owner[edges]
+    chrf = index.chrf[edges]
+    keep = (
+        (index.partner_ids[edges] != index.index_ids[owners])
+        & ~np.isnan(index.latitudes[edges])
+        & ~np.isnan(index.owner_latitudes[owners])
+    )
+    if options.min_chrf is not None:
+        keep &= chrf >= options.min_chrf
 
-def add_language_connections(m, df, selected_language_id=None):
-    """Add lines connecting languages that have NMT pairs."""
-    if selected_language_id is None:
-        return
+    # Strongest first, NULL scores last
+    edges, owners, chrf = edges[keep], owners[keep], chrf[keep]
+    order = np.argsort(np.where(np.isnan(chrf), np.inf, -chrf), kind='stable')[:options.top_k]
+    edges, owners, chrf = edges[order], owners[order], chrf[order]
 
-    # Get the selected language's data
-    selected_lang = df[df['id'] == selected_language_id].iloc[0]
+    owner_ids = index.index_ids[owners]
+    partner_ids = index.partner_ids[edges]
+    is_source = index.direction[edges] == SOURCE
+    bands = np.where(np.isnan(chrf), 0, np.searchsorted(CONNECTION_BANDS, chrf, side='right'))
 
-    if not isinstance(selected_lang.get('connected_coords'), (list, np.ndarray)):
-        return
+    def scores(values):
+        return [None if np.isnan(v) else round(float(v), 2) for v in values]
 
-    # Create a feature group for connections
-    connections_group = folium.FeatureGroup(name="NMT Connections")
-
-    # Get source coordinates
-    source_coords = [selected_lang['latitude'], selected_lang['longitude']]
-
-    # Add lines for each connection
-    for idx, target_coords in enumerate(selected_lang['connected_coords']):
-        if isinstance(target_coords, (list, np.ndarray)) and len(target_coords) == 2:
-            # Get the connected language name and scores
-            connected_lang_name = selected_lang['connected_languages'][idx] if isinstance(selected_lang.get('connected_languages'), (list, np.ndarray)) and idx < len(selected_lang['connected_languages']) else 'Unknown'
-
-            # Get scores for this pair
-            pair_data = {
-                'chrf_score': selected_lang['chrf_scores'][idx] if isinstance(selected_lang.get('chrf_scores'), (list, np.ndarray)) and idx < len(selected_lang['chrf_scores']) else 0.0,
-                'bleu_score': selected_lang['bleu_scores'][idx] if isinstance(selected_lang.get('bleu_scores'), (list, np.ndarray)) and idx < len(selected_lang['bleu_scores']) else 0.0
-            }
-
-            # Create popup content
-            popup_content = create_pair_popup_content(
-                selected_lang['name'],
-                connected_lang_name,
-                pair_data
-            )
-
-            # Create a line with animation and enhanced popup
-            line = plugins.AntPath(
-                locations=[source_coords, target_coords],
-                weight=2,
-                color='#4CAF50',
-                opacity=0.6
-            )
-            # Add popup to the line
-            popup = folium.Popup(popup_content, max_width=300)
-            line.add_child(popup)
-            line.add_to(connections_group)
-
-            # Add markers for connected languages with enhanced popup
-            marker = folium.CircleMarker(
-                location=target_coords,
-                radius=8,
-                color="#4CAF50",
-                fill=True,
-                popup=folium.Popup(popup_content, max_width=300)
-            )
-            marker.add_to(connections_group)
-
-    connections_group.add_to(m)
+    return {
+        'source': store.names_for(np.where(is_source, owner_ids, partner_ids)).tolist(),
+        'target': store.names_for(np.where(is_source, partner_ids, owner_ids)).tolist(),
+        'source_lat': index.owner_latitudes[owners].tolist(),
+        'source_lon': index.owner_longitudes[owners].tolist(),
+        'lat': index.latitudes[edges].tolist(),
+        'lon': index.longitudes[edges].tolist(),
+        'chrf': scores(chrf),
+        'bleu': scores(index.bleu[edges]),
+        'band': bands.tolist(),
+    }
+
+def add_language_connections(m, connections=None):
+    """Add lines for translation pairs, colored and weighted by chrF++.
+
+    connections is a components.ConnectionOptions; None adds nothing.
+    """
+    if connections is None:
+        return
+    edges = connection_edges(get_edge_index(), get_pair_store(), connections)
+    if edges['band']:
+        ConnectionLayer(edges, CONNECTION_STYLES).add_to(m)
 
 def create_popup_content(row):
     """Create HTML content for map marker popup."""
@@ -184,20 +174,9 @@ def create_popup_content(row):
         <p><strong>NMT Pairs:</strong> {row.get('nmt_pair_count', 0)} language pairs</p>
         """
 
-    connected_langs = ''
-    if isinstance(row.get('connected_languages'), str) and row['connected_languages'].strip():
-        connected_langs = """
-        <p><strong>Connected Languages:</strong></p>
-        <div style='margin-top: 5px; max-height: 100px; overflow-y: auto;'>
-            {}
-        </div>
-        """.format(
-            '<br>'.join(f"• {lang}" for lang in row['connected_languages'].split(', '))
-        )
-
     view_details_button = f"""
         <div style='margin-top: 10px'>
-            <a href="?selected_language={row['id']}" 
+            <a href="?selected_language={row['id']}" target="_top"
                style="
                    display: inline-block;
                    color: white;
@@ -225,43 +204,105 @@ def create_popup_content(row):
             {''.join(model_badges) if model_badges else '<span style="color: #666;">None available</span>'}
         </div>
         {nmt_info}
-        {connected_langs}
         {view_details_button}
     </div>
     """
 
-def display_map(df, selected_models=None, selected_language_id=None):
-    """Create and display the map with language markers and connections."""
+# Default marker clustering kicks in above this many languages
+CLUSTER_THRESHOLD = 1000
+
+# Size of the map component, as folium_static used to render it
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+
+def build_map(df, selected_models=None, connections=None, cluster=None):
+    """Create the map with language markers and connections."""
     m = create_base_map()
 
     # Add the language connections first so they appear under the markers
-    add_language_connections(m, df, selected_language_id)
+    add_language_connections(m, connections)
 
     # Add the language markers
-    add_language_markers(m, df, selected_models)
+    add_language_markers(m, df, selected_models, cluster)
 
     # Add layer controls
     folium.LayerControl().add_to(m)
+    return m
 
-    folium_static(m)
+def render_map_html(df, selected_models=None, connections=None, cluster=None):
+    """Render the map to a standalone HTML document."""
+    m = build_map(df, selected_models, connections, cluster)
+    return folium.Figure().add_child(m).render()
 
-def add_language_markers(m, df, selected_models):
-    """Add language markers to the map with popup information."""
-    for _, row in df.iterrows():
-        icon_html = create_model_indicator_html(row.get('available_models'), selected_models)
+def display_map(df, selected_models=None, connections=None, cluster=None, generation=None):
+    """Display the map, reusing the rendered HTML for a repeated view of the same data.
 
-        if selected_models and icon_html is None:
-            continue
+    generation identifies the data in df; without it the map is always rebuilt.
+    """
+    def render():
+        return render_map_html(df, selected_models, connections, cluster)
 
-        custom_icon = folium.DivIcon(
-            html=icon_html,
-            icon_size=(24, 24),
-            icon_anchor=(12, 12)
-        )
+    if generation is None:
+        html = render()
+    else:
+        key = (generation, tuple(sorted(selected_models or [])), connections, cluster)
+        html = get_map_cache().get_or_render(key, render)
+
+    components.html(html, width=MAP_WIDTH, height=MAP_HEIGHT + 10)
 
-        marker = folium.Marker(
-            location=[row['latitude'], row['longitude']],
-            popup=folium.Popup(create_popup_content(row), max_width=300),
-            icon=custom_icon
+def build_marker_features(df, selected_models, lazy_popups=True):
+    """Build GeoJSON point features for the markers from the DataFrame columns.
+
+    Features reference the shared MARKER_ICONS table by index. With
+    lazy_popups, features carry only an id and icon, and a compact popup
+    table is returned for the browser to render popups from on click;
+    otherwise each feature embeds its popup HTML and the table is None.
+    """
+    masks = model_masks(df)
+    icon_ids = marker_icon_ids(masks, selected_models)
+    shown = icon_ids >= 0
+    visible = df[shown]
+
+    properties = [
+        {'id': lang_id, 'icon': icon}
+        for lang_id, icon in zip(visible['id'].tolist(), icon_ids[shown].tolist())
+    ]
+
+    popup_table = None
+    if lazy_popups:
+        popup_table = {
+            'id': visible['id'].tolist(),
+            'name': visible['name'].tolist(),
+            'iso': visible['iso_code'].where(visible['iso_code'].notna(), None).tolist(),
+            'pairs': visible['nmt_pair_count'].fillna(0).astype(int).tolist(),
+            'models': masks[shown].tolist(),
+            'combos': [mask_to_models(mask) for mask in range(MASK_VALUES)],
+            'colors': get_model_colors()
+        }
+    else:
+        for props, row in zip(properties, visible.to_dict('records')):
+            props['popup'] = create_popup_content(row)
+
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': props
+        }
+        for lat, lon, props in zip(
+            visible['latitude'].tolist(),
+            visible['longitude'].tolist(),
+            properties
         )
-        marker.add_to(m)
\ No newline at end of file
+    ]
+    return features, popup_table
+
+def add_language_markers(m, df, selected_models, cluster=None, lazy_popups=True):
+    """Add language markers to the map as a single GeoJSON layer.
+
+    cluster defaults to on when there are more than CLUSTER_THRESHOLD languages.
+    """
+    features, popup_table = build_marker_features(df, selected_models, lazy_popups)
+    if cluster is None:
+        cluster = len(features) > CLUSTER_THRESHOLD
+    LanguageMarkerLayer(features, MARKER_ICONS, popup_table, cluster=cluster).add_to(m)
@@ -0,0 +1,513 @@
+import json
+from collections import namedtuple
+from sqlalchemy import text
+
+# A schema change. Dataset migrations touch the tables a backup restore
+# replaces and must be idempotent. A migration's statements are frozen once it
+# ships; later changes are new migrations.
+Migration = namedtuple('Migration', ['version', 'name', 'statements', 'dataset'])
+
+# Arbitrary key so concurrent app replicas don't migrate at the same time
+MIGRATION_LOCK_ID = 72201
+
+SCHEMA_MIGRATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version integer PRIMARY KEY,
+        name text NOT NULL,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+    """
+
+DATA_GENERATION_SQL = """
+    CREATE TABLE IF NOT EXISTS data_generation (
+        scope text PRIMARY KEY,
+        generation bigint NOT NULL,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    )
+    """
+
+# Reverse-geocoding results keyed by coordinates rounded to two decimals
+GEOCODE_CACHE_SQL = """
+    CREATE TABLE IF NOT EXISTS geocode_cache (
+        lat_key numeric(5, 2) NOT NULL,
+        lon_key numeric(5, 2) NOT NULL,
+        city text,
+        country text,
+        resolved_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (lat_key, lon_key)
+    )
+    """
+
+PAIR_INDEX_SQL = [
+    # Per-language pair lookups filter on one side and order by chrF++; the
+    # leading id column also serves plain id lookups and the connection views.
+    """
+    CREATE INDEX IF NOT EXISTS nmt_pairs_source_source_chrf_idx
+    ON nmt_pairs_source (source_lang_id, chrf_plus DESC NULLS LAST)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS nmt_pairs_source_target_chrf_idx
+    ON nmt_pairs_source (target_lang_id, chrf_plus DESC NULLS LAST)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS nmt_pairs_source_chrf_idx
+    ON nmt_pairs_source (chrf_plus DESC NULLS LAST)
+    """,
+]
+
+# Score imports match rows on the FLORES code pair
+PAIR_CODE_INDEX_SQL = [
+    'CREATE INDEX IF NOT EXISTS nmt_pairs_source_codes_idx ON nmt_pairs_source ("Source", "Target")',
+]
+
+LANGUAGE_INDEX_SQL = [
+    "CREATE INDEX IF NOT EXISTS language_new_coordinates_idx ON language_new USING GIST (coordinates)",
+    "CREATE INDEX IF NOT EXISTS language_new_lang_fam_id_idx ON language_new (lang_fam_id)",
+    "CREATE INDEX IF NOT EXISTS language_new_lang_sub_id_idx ON language_new (lang_sub_id)",
+]
+
+# The shipped dump declares the pair foreign keys NOT VALID. Add them if a dump
+# lacks them, and validate only when there are no orphans so a dirty dump can
+# still be migrated.
+PAIR_FOREIGN_KEY_SQL = [
+    """
+    DO $$
+    DECLARE
+        side text;
+        no_orphans boolean;
+    BEGIN
+        FOREACH side IN ARRAY ARRAY['source_lang_id', 'target_lang_id'] LOOP
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = 'nmt_pairs_source'::regclass AND conname = side
+            ) THEN
+                EXECUTE format(
+                    'ALTER TABLE nmt_pairs_source ADD CONSTRAINT %I '
+                    'FOREIGN KEY (%I) REFERENCES language_new(id) NOT VALID',
+                    side, side
+                );
+            END IF;
+
+            EXECUTE format(
+                'SELECT NOT EXISTS ('
+                '    SELECT 1 FROM nmt_pairs_source nps'
+                '    LEFT JOIN language_new l ON l.id = nps.%I'
+                '    WHERE nps.%I IS NOT NULL AND l.id IS NULL'
+                ')',
+                side, side
+            ) INTO STRICT no_orphans;
+            IF no_orphans THEN
+                EXECUTE format('ALTER TABLE nmt_pairs_source VALIDATE CONSTRAINT %I', side);
+            ELSE
+                RAISE WARNING 'nmt_pairs_source.% has orphaned rows; constraint left NOT VALID', side;
+            END IF;
+        END LOOP;
+    END
+    $$
+    """,
+]
+
+LANGUAGE_EDGES_SQL = [
+    # Undirected edge list: every pair appears once per endpoint, with the
+    # partner's coordinates extracted so readers never touch PostGIS casts.
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS language_edges AS
+    SELECT
+        e.lang_id,
+        e.partner_id,
+        p.lang_name AS partner_name,
+        CASE WHEN ST_IsValid(p.coordinates::geometry)
+             THEN ST_Y(p.coordinates::geometry) END AS partner_latitude,
+        CASE WHEN ST_IsValid(p.coordinates::geometry)
+             THEN ST_X(p.coordinates::geometry) END AS partner_longitude,
+        e.chrf_plus,
+        e.spbleu_spm_200,
+        e.direction
+    FROM (
+        SELECT source_lang_id AS lang_id, target_lang_id AS partner_id,
+               chrf_plus, spbleu_spm_200, 'Source' AS direction
+        FROM nmt_pairs_source
+        UNION ALL
+        SELECT target_lang_id, source_lang_id,
+               chrf_plus, spbleu_spm_200, 'Target'
+        FROM nmt_pairs_source
+    ) e
+    JOIN language_new p ON p.id = e.partner_id
+    WHERE e.lang_id IS NOT NULL
+        AND e.lang_id != e.partner_id
+    """,
+    "CREATE INDEX IF NOT EXISTS language_edges_lang_id_idx ON language_edges (lang_id)",
+]
+
+# language_connection_snapshot as each migration that (re)built it shipped
+# it. Shipped statements never change; a new definition is a new literal and
+# a new migration, and DATASET_SQL points at the latest.
+LANGUAGE_SNAPSHOT_V1_SQL = [
+    # One row per mappable language with everything load_language_data returns.
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS language_connection_snapshot AS
+    WITH pair_counts AS (
+        SELECT lang_id, COUNT(*) AS nmt_pair_count
+        FROM (
+            SELECT source_lang_id AS lang_id FROM nmt_pairs_source
+            UNION ALL
+            SELECT target_lang_id FROM nmt_pairs_source
+            WHERE target_lang_id IS DISTINCT FROM source_lang_id
+        ) ids
+        WHERE lang_id IS NOT NULL
+        GROUP BY lang_id
+    ),
+    lang_connections AS (
+        SELECT
+            lang_id,
+            array_agg(DISTINCT partner_name) as connected_languages,
+            array_agg(DISTINCT ARRAY[partner_latitude, partner_longitude]::float[]) FILTER (WHERE
+                partner_latitude BETWEEN -90 AND 90
+                AND partner_longitude BETWEEN -180 AND 180
+            ) as connected_coords,
+            array_agg(DISTINCT partner_id) as connected_lang_ids,
+            array_agg(DISTINCT chrf_plus) as chrf_scores,
+            array_agg(DISTINCT spbleu_spm_200) as bleu_scores
+        FROM language_edges
+        WHERE partner_latitude IS NOT NULL
+        GROUP BY lang_id
+    ),
+    located AS (
+        SELECT *,
+            ST_Y(coordinates::geometry) as latitude,
+            ST_X(coordinates::geometry) as longitude
+        FROM language_new
+        WHERE coordinates IS NOT NULL
+            AND ST_IsValid(coordinates::geometry)
+    )
+    SELECT
+        l.id,
+        l.lang_name as name,
+        l.iso_code,
+        l.latitude,
+        l.longitude,
+        ARRAY[
+            CASE WHEN l.asr THEN 'ASR' END,
+            CASE WHEN l.nmt THEN 'NMT' END,
+            CASE WHEN l.tts THEN 'TTS' END
+        ] as available_models,
+        COALESCE(pc.nmt_pair_count, 0) as nmt_pair_count,
+        COALESCE(lc.connected_languages, ARRAY[]::text[]) as connected_languages,
+        COALESCE(lc.connected_coords, ARRAY[]::float[][]) as connected_coords,
+        COALESCE(lc.connected_lang_ids, ARRAY[]::integer[]) as connected_lang_ids,
+        COALESCE(lc.chrf_scores, ARRAY[]::float[]) as chrf_scores,
+        COALESCE(lc.bleu_scores, ARRAY[]::float[]) as bleu_scores,
+        lc.lang_id IS NOT NULL as has_nmt_pair
+    FROM located l
+    LEFT JOIN pair_counts pc ON l.id = pc.lang_id
+    LEFT JOIN lang_connections lc ON l.id = lc.lang_id
+    WHERE l.longitude BETWEEN -180 AND 180
+        AND l.latitude BETWEEN -90 AND 90
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS language_connection_snapshot_id_idx ON language_connection_snapshot (id)",
+    "CREATE INDEX IF NOT EXISTS language_connection_snapshot_name_idx ON language_connection_snapshot (name)",
+]
+
+LANGUAGE_SNAPSHOT_V2_SQL = [
+    # One row per mappable language with everything load_language_data returns.
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS language_connection_snapshot AS
+    WITH pair_counts AS (
+        SELECT lang_id, COUNT(*) AS nmt_pair_count
+        FROM (
+            SELECT source_lang_id AS lang_id FROM nmt_pairs_source
+            UNION ALL
+            SELECT target_lang_id FROM nmt_pairs_source
+            WHERE target_lang_id IS DISTINCT FROM source_lang_id
+        ) ids
+        WHERE lang_id IS NOT NULL
+        GROUP BY lang_id
+    ),
+    lang_connections AS (
+        SELECT
+            lang_id,
+            array_agg(DISTINCT partner_name) as connected_languages,
+            array_agg(DISTINCT ARRAY[partner_latitude, partner_longitude]::float[]) FILTER (WHERE
+                partner_latitude BETWEEN -90 AND 90
+                AND partner_longitude BETWEEN -180 AND 180
+            ) as connected_coords,
+            array_agg(DISTINCT partner_id) as connected_lang_ids,
+            array_agg(DISTINCT chrf_plus) as chrf_scores,
+            array_agg(DISTINCT spbleu_spm_200) as bleu_scores
+        FROM language_edges
+        WHERE partner_latitude IS NOT NULL
+        GROUP BY lang_id
+    ),
+    located AS (
+        SELECT *,
+            ST_Y(coordinates::geometry) as latitude,
+            ST_X(coordinates::geometry) as longitude
+        FROM language_new
+        WHERE coordinates IS NOT NULL
+            AND ST_IsValid(coordinates::geometry)
+    )
+    SELECT
+        l.id,
+        l.lang_name as name,
+        l.iso_code,
+        l.latitude,
+        l.longitude,
+        ARRAY[
+            CASE WHEN l.asr THEN 'ASR' END,
+            CASE WHEN l.nmt THEN 'NMT' END,
+            CASE WHEN l.tts THEN 'TTS' END
+        ] as available_models,
+        -- ASR, NMT and TTS availability as bits 1, 2 and 4 (see model_mask.py)
+        (
+            CASE WHEN l.asr THEN 1 ELSE 0 END
+            | CASE WHEN l.nmt THEN 2 ELSE 0 END
+            | CASE WHEN l.tts THEN 4 ELSE 0 END
+        )::smallint as model_mask,
+        COALESCE(pc.nmt_pair_count, 0) as nmt_pair_count,
+        COALESCE(lc.connected_languages, ARRAY[]::text[]) as connected_languages,
+        COALESCE(lc.connected_coords, ARRAY[]::float[][]) as connected_coords,
+        COALESCE(lc.connected_lang_ids, ARRAY[]::integer[]) as connected_lang_ids,
+        COALESCE(lc.chrf_scores, ARRAY[]::float[]) as chrf_scores,
+        COALESCE(lc.bleu_scores, ARRAY[]::float[]) as bleu_scores,
+        lc.lang_id IS NOT NULL as has_nmt_pair
+    FROM located l
+    LEFT JOIN pair_counts pc ON l.id = pc.lang_id
+    LEFT JOIN lang_connections lc ON l.id = lc.lang_id
+    WHERE l.longitude BETWEEN -180 AND 180
+        AND l.latitude BETWEEN -90 AND 90
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS language_connection_snapshot_id_idx ON language_connection_snapshot (id)",
+    "CREATE INDEX IF NOT EXISTS language_connection_snapshot_name_idx ON language_connection_snapshot (name)",
+]
+
+LANGUAGE_SNAPSHOT_V3_SQL = [
+    # One row per mappable language with everything load_language_data returns.
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS language_connection_snapshot AS
+    WITH pair_counts AS (
+        SELECT lang_id, COUNT(*) AS nmt_pair_count
+        FROM (
+            SELECT source_lang_id AS lang_id FROM nmt_pairs_source
+            UNION ALL
+            SELECT target_lang_id FROM nmt_pairs_source
+            WHERE target_lang_id IS DISTINCT FROM source_lang_id
+        ) ids
+        WHERE lang_id IS NOT NULL
+        GROUP BY lang_id
+    ),
+    -- Languages with a partner on the map; the edges themselves are read
+    -- from the in-memory edge index (see edge_index.py)
+    connected AS (
+        SELECT DISTINCT lang_id
+        FROM language_edges
+        WHERE partner_latitude IS NOT NULL
+    ),
+    located AS (
+        SELECT *,
+            ST_Y(coordinates::geometry) as latitude,
+            ST_X(coordinates::geometry) as longitude
+        FROM language_new
+        WHERE coordinates IS NOT NULL
+            AND ST_IsValid(coordinates::geometry)
+    )
+    SELECT
+        l.id,
+        l.lang_name as name,
+        l.iso_code,
+        l.latitude,
+        l.longitude,
+        ARRAY[
+            CASE WHEN l.asr THEN 'ASR' END,
+            CASE WHEN l.nmt THEN 'NMT' END,
+            CASE WHEN l.tts THEN 'TTS' END
+        ] as available_models,
+        -- ASR, NMT and TTS availability as bits 1, 2 and 4 (see model_mask.py)
+        (
+            CASE WHEN l.asr THEN 1 ELSE 0 END
+            | CASE WHEN l.nmt THEN 2 ELSE 0 END
+            | CASE WHEN l.tts THEN 4 ELSE 0 END
+        )::smallint as model_mask,
+        COALESCE(pc.nmt_pair_count, 0) as nmt_pair_count,
+        c.lang_id IS NOT NULL as has_nmt_pair
+    FROM located l
+    LEFT JOIN pair_counts pc ON l.id = pc.lang_id
+    LEFT JOIN connected c ON l.id = c.lang_id
+    WHERE l.longitude BETWEEN -180 AND 180
+        AND l.latitude BETWEEN -90 AND 90
+    """,
+    # The unique index also lets refresh_language_snapshot refresh the view
+    # CONCURRENTLY.
+    "CREATE UNIQUE INDEX IF NOT EXISTS language_connection_snapshot_id_idx ON language_connection_snapshot (id)",
+    "CREATE INDEX IF NOT EXISTS language_connection_snapshot_name_idx ON language_connection_snapshot (name)",
+]
+
+LANGUAGE_SNAPSHOT_SQL = LANGUAGE_SNAPSHOT_V3_SQL
+
+MIGRATIONS = [
+    Migration(1, 'data_generation', [DATA_GENERATION_SQL], False),
+    Migration(2, 'pair_indexes', PAIR_INDEX_SQL, True),
+    Migration(3, 'language_indexes', LANGUAGE_INDEX_SQL, True),
+    Migration(4, 'pair_foreign_keys', PAIR_FOREIGN_KEY_SQL, True),
+    Migration(5, 'language_snapshot', LANGUAGE_EDGES_SQL + LANGUAGE_SNAPSHOT_V1_SQL, True),
+    Migration(6, 'geocode_cache', [GEOCODE_CACHE_SQL], False),
+    Migration(
+        7, 'language_snapshot_model_mask',
+        ["DROP MATERIALIZED VIEW IF EXISTS language_connection_snapshot"] + LANGUAGE_SNAPSHOT_V2_SQL,
+        True
+    ),
+    Migration(8, 'pair_code_index', PAIR_CODE_INDEX_SQL, True),
+    Migration(
+        9, 'language_snapshot_without_edge_arrays',
+        ["DROP MATERIALIZED VIEW IF EXISTS language_connection_snapshot"] + LANGUAGE_SNAPSHOT_V3_SQL,
+        True
+    ),
+]
+
+# End state of the dataset migrations. A database without any dataset
+# migration, a reapply after a restore and the staging build (see staging.py)
+# all create it directly instead of replaying MIGRATIONS, so a new dataset
+# migration must also update this. Everything here must be safe to run on an
+# empty schema.
+DATASET_SQL = (
+    PAIR_INDEX_SQL + PAIR_CODE_INDEX_SQL + LANGUAGE_INDEX_SQL + PAIR_FOREIGN_KEY_SQL
+    + LANGUAGE_EDGES_SQL + LANGUAGE_SNAPSHOT_SQL
+)
+
+# Tables the dataset migrations build on. They come from a restored dump, not
+# from a migration.
+DATASET_BASE_TABLES = ['language_new', 'nmt_pairs_source']
+
+def applied_versions(connection):
+    """Return the set of migration versions already recorded in the database."""
+    connection.execute(text(SCHEMA_MIGRATIONS_SQL))
+    rows = connection.execute(text("SELECT version FROM schema_migrations")).all()
+    return {version for version, in rows}
+
+def dataset_tables_exist(connection):
+    """True when the dump's tables the dataset migrations need are present."""
+    return all(
+        connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+        for name in DATASET_BASE_TABLES
+    )
+
+def _record(connection, migration):
+    connection.execute(text("""
+        INSERT INTO schema_migrations (version, name)
+        VALUES (:version, :name)
+        ON CONFLICT (version) DO UPDATE SET applied_at = now()
+        """), {'version': migration.version, 'name': migration.name})
+
+def run_migrations(connection, reapply_dataset=False):
+    """Apply pending migrations in order and return the ones that ran.
+
+    Dataset migrations wait, still pending, until a dump has created the
+    tables they index. When none has run yet, or with reapply_dataset (the
+    tables were replaced by a restore), DATASET_SQL builds their end state
+    once and they are all recorded; otherwise pending ones run in order.
+    """
+    connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {'lock_id': MIGRATION_LOCK_ID})
+    applied = applied_versions(connection)
+
+    ran = []
+    for migration in MIGRATIONS:
+        if not migration.dataset and migration.version not in applied:
+            for statement in migration.statements:
+                connection.execute(text(statement))
+            _record(connection, migration)
+            ran.append(migration)
+
+    dataset = [m for m in MIGRATIONS if m.dataset]
+    if not dataset_tables_exist(connection):
+        return ran
+    if reapply_dataset or not any(m.version in applied for m in dataset):
+        for statement in DATASET_SQL:
+            connection.execute(text(statement))
+        pending = dataset
+    else:
+        pending = [m for m in dataset if m.version not in applied]
+        for migration in pending:
+            for statement in migration.statements:
+                connection.execute(text(statement))
+    for migration in pending:
+        _record(connection, migration)
+    return ran + pending
+
+# Hot queries and the index each must be able to use, for check_query_plans
+HOT_QUERIES = [
+    (
+        'pairs by source language',
+        """
+        SELECT * FROM nmt_pairs_source
+        WHERE source_lang_id = 1
+        ORDER BY chrf_plus DESC NULLS LAST
+        """,
+        'nmt_pairs_source_source_chrf_idx'
+    ),
+    (
+        'pairs by target language',
+        """
+        SELECT * FROM nmt_pairs_source
+        WHERE target_lang_id = 1
+        ORDER BY chrf_plus DESC NULLS LAST
+        """,
+        'nmt_pairs_source_target_chrf_idx'
+    ),
+    (
+        'top pairs by score',
+        """
+        SELECT * FROM nmt_pairs_source
+        ORDER BY chrf_plus DESC NULLS LAST
+        LIMIT 100
+        """,
+        'nmt_pairs_source_chrf_idx'
+    ),
+    (
+        'languages near a point',
+        """
+        SELECT id FROM language_new
+        WHERE ST_DWithin(coordinates, ST_MakePoint(0, 0)::geography, 500000)
+        """,
+        'language_new_coordinates_idx'
+    ),
+    (
+        'languages in a family',
+        "SELECT id, lang_name FROM language_new WHERE lang_fam_id = 1",
+        'language_new_lang_fam_id_idx'
+    ),
+    (
+        'connections of a language',
+        "SELECT * FROM language_edges WHERE lang_id = 1",
+        'language_edges_lang_id_idx'
+    ),
+    (
+        'language snapshot scan',
+        "SELECT * FROM language_connection_snapshot ORDER BY name",
+        'language_connection_snapshot_name_idx'
+    ),
+]
+
+def _plan_index_names(plan):
+    """Collect every index name referenced anywhere in an EXPLAIN JSON plan."""
+    names = set()
+    if 'Index Name' in plan:
+        names.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        names |= _plan_index_names(child)
+    return names
+
+def check_query_plans(connection):
+    """EXPLAIN each hot query and report whether it uses its expected index.
+
+    Sequential scans are disabled for the check: on small tables the planner
+    rightly prefers them, and the point is that the index is usable at all.
+    Returns a list of (name, expected_index, ok, used_indexes) tuples.
+    """
+    results = []
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    for name, query, expected_index in HOT_QUERIES:
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        used = _plan_index_names(plan[0]['Plan'])
+        results.append((name, expected_index, expected_index in used, sorted(used)))
+    return results
@@ -0,0 +1,37 @@
+import numpy as np
+
+# Model availability is a 3-bit mask; the SQL snapshot computes the same bits
+MODEL_TYPES = ['ASR', 'NMT', 'TTS']
+MODEL_BITS = {'ASR': 1, 'NMT': 2, 'TTS': 4}
+MASK_VALUES = 1 << len(MODEL_TYPES)
+
+# Number of models in each of the 8 possible masks
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(MASK_VALUES)], dtype=np.uint8)
+
+def selection_mask(models):
+    """Combine model names into one mask; an empty selection is 0."""
+    mask = 0
+    for model in models or []:
+        mask |= MODEL_BITS[model]
+    return mask
+
+def mask_to_models(mask):
+    """Model names set in a mask, in MODEL_TYPES order."""
+    return [model for model in MODEL_TYPES if int(mask) & MODEL_BITS[model]]
+
+def model_masks(df):
+    """uint8 mask array for a language frame, from model_mask or available_models."""
+    if 'model_mask' in df:
+        return df['model_mask'].to_numpy(dtype=np.uint8)
+    return np.fromiter(
+        (selection_mask(m for m in (models if models is not None else []) if m) for models in df['available_models']),
+        dtype=np.uint8,
+        count=len(df)
+    )
+
+def matches_selection(masks, selected_models):
+    """Boolean array of languages offering at least one selected model."""
+    selected = selection_mask(selected_models)
+    if not selected:
+        return np.ones(len(masks), dtype=bool)
+    return (masks & selected) != 0
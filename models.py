@@ -1,25 +1,25 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, MetaData, Boolean
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from geoalchemy2 import Geometry
+from geoalchemy2 import Geography
 
+# These models mirror the tables shipped in the database dumps. The schema
+# itself is owned by migrations.py; the indexes declared here match it.
 Base = declarative_base()
 
-# Association table for many-to-many relationship between languages and model types
-language_models = Table(
-    'language_models',
-    Base.metadata,
-    Column('language_id', Integer, ForeignKey('languages.id'), primary_key=True),
-    Column('model_type_id', Integer, ForeignKey('model_types.id'), primary_key=True)
-)
+class Continent(Base):
+    """Model representing a continent."""
+    __tablename__ = 'continent'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255))
 
 class LanguageFamily(Base):
     """Model representing language families."""
-    __tablename__ = 'language_families'
+    __tablename__ = 'language_family'
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(255), nullable=False, unique=True)
-    description = Column(String(1000))
+    name = Column(String(255))
 
     # Relationships
     subfamilies = relationship('LanguageSubfamily', back_populates='family')
@@ -27,12 +27,11 @@ class LanguageFamily(Base):
 
 class LanguageSubfamily(Base):
     """Model representing language subfamilies."""
-    __tablename__ = 'language_subfamilies'
+    __tablename__ = 'language_subfamily'
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
-    description = Column(String(1000))
-    family_id = Column(Integer, ForeignKey('language_families.id'))
+    family_id = Column(Integer, ForeignKey('language_family.id'))
 
     # Relationships
     family = relationship('LanguageFamily', back_populates='subfamilies')
@@ -40,64 +39,64 @@ class LanguageSubfamily(Base):
 
 class Language(Base):
     """Model representing a language and its geographical information."""
-    __tablename__ = 'languages'
+    __tablename__ = 'language_new'
+    __table_args__ = (
+        Index('language_new_coordinates_idx', 'coordinates', postgresql_using='gist'),
+        Index('language_new_lang_fam_id_idx', 'lang_fam_id'),
+        Index('language_new_lang_sub_id_idx', 'lang_sub_id'),
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(255), nullable=False)
-    iso_code = Column(String(10), nullable=False, unique=True)
-    glottocode = Column(String(20))
-    speakers = Column(Integer)
-    main_city = Column(String(255))
-    continent = Column(String(100))
-    latitude = Column(Float)
-    longitude = Column(Float)
-    geom = Column(Geometry('POINT'))
-    resources_url = Column(String(500))
-    description = Column(String(1000))
+    lang_name = Column(String(155), nullable=False)
+    iso_code = Column(String(10))
+    glottocode = Column(String(10))
+    lang_fam_id = Column(Integer, ForeignKey('language_family.id'))
+    lang_sub_id = Column(Integer, ForeignKey('language_subfamily.id'))
+    dialect_or_variation = Column(Boolean)
+    continent_id = Column(Integer, ForeignKey('continent.id'))
+    coordinates = Column(Geography('POINT', srid=4326, spatial_index=False))
+    geo_center = Column(String(155))
 
     # Model availability flags and metadata
-    asr = Column(Boolean, default=False)
-    asr_hours = Column(Float)
-    asr_speakers = Column(Integer)
-    asr_url = Column(String(500))
-
-    nmt = Column(Boolean, default=False)
-    nmt_pairs = Column(String(500))
-    nmt_url = Column(String(500))
+    asr = Column(Boolean)
+    asr_hours = Column(Integer)
+    asr_url = Column(String(1000))
 
-    tts = Column(Boolean, default=False)
-    tts_hours = Column(Float)
-    tts_url = Column(String(500))
+    nmt = Column(Boolean)
+    nmt_url = Column(String(1000))
+    nmt_pairs = Column(Integer)
 
-    # Foreign keys for family relationships
-    family_id = Column(Integer, ForeignKey('language_families.id'))
-    subfamily_id = Column(Integer, ForeignKey('language_subfamilies.id'))
+    tts = Column(Boolean)
+    tts_url = Column(String(1000))
 
     # Relationships
     family = relationship('LanguageFamily', back_populates='languages')
     subfamily = relationship('LanguageSubfamily', back_populates='languages')
-    model_types = relationship(
-        'ModelType',
-        secondary=language_models,
-        back_populates='languages'
-    )
 
     def __repr__(self):
-        return f"<Language(name='{self.name}', iso_code='{self.iso_code}')>"
-
-class ModelType(Base):
-    """Model representing different types of language models."""
-    __tablename__ = 'model_types'
+        return f"<Language(lang_name='{self.lang_name}', iso_code='{self.iso_code}')>"
+
+class NmtPairSource(Base):
+    """Model representing FLORES-200 translation quality scores for a language pair."""
+    __tablename__ = 'nmt_pairs_source'
+    __table_args__ = (
+        Index('nmt_pairs_source_source_chrf_idx', 'source_lang_id', 'chrf_plus'),
+        Index('nmt_pairs_source_target_chrf_idx', 'target_lang_id', 'chrf_plus'),
+        Index('nmt_pairs_source_chrf_idx', 'chrf_plus'),
+        Index('nmt_pairs_source_codes_idx', 'Source', 'Target'),
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(50), nullable=False, unique=True)
-    description = Column(String(255))
+    source_code = Column('Source', String(50))
+    target_code = Column('Target', String(50))
+    chrf_plus = Column(Numeric(5, 2))
+    spbleu_spm_200 = Column(Numeric(5, 2))
+    spbleu_spm_100 = Column(Numeric(5, 2))
+    source_lang_id = Column(Integer, ForeignKey('language_new.id', name='source_lang_id'))
+    target_lang_id = Column(Integer, ForeignKey('language_new.id', name='target_lang_id'))
 
-    languages = relationship(
-        'Language',
-        secondary=language_models,
-        back_populates='model_types'
-    )
+    source_language = relationship('Language', foreign_keys=[source_lang_id])
+    target_language = relationship('Language', foreign_keys=[target_lang_id])
 
     def __repr__(self):
-        return f"<ModelType(name='{self.name}')>"
\ No newline at end of file
+        return f"<NmtPairSource(source='{self.source_code}', target='{self.target_code}')>"
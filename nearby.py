@@ -0,0 +1,105 @@
+import html
+import math
+import folium
+import streamlit as st
+import streamlit.components.v1 as components
+from database import get_spatial_index
+from components import render_model_filters
+from map_utils import MAP_HEIGHT, MAP_WIDTH, create_base_map, get_model_colors
+from model_mask import mask_to_models, selection_mask
+
+CENTER_MODES = ["A language", "Coordinates"]
+SEARCH_MODES = ["Within a radius", "Nearest languages"]
+
+def zoom_for_radius(radius_km):
+    """A map zoom level that fits a circle of radius_km."""
+    return int(min(10, max(2, round(math.log2(20000 / max(radius_km, 1))))))
+
+def search_nearby(index, lat, lon, mode, radius_km, k, selected_models, exclude_id=None):
+    """Run a radius or nearest-neighbour query, leaving out exclude_id."""
+    mask = selection_mask(selected_models)
+    if mode == SEARCH_MODES[0]:
+        found = index.within(lat, lon, radius_km, mask)
+    else:
+        found = index.nearest(lat, lon, k + (exclude_id is not None), mask)
+    if exclude_id is not None:
+        found = found[found['id'] != exclude_id]
+    if mode == SEARCH_MODES[1]:
+        found = found.head(k)
+    return found.reset_index(drop=True)
+
+def render_nearby_map(lat, lon, found, radius_km=None):
+    """Map of the search point, the search circle and the languages found."""
+    reach = radius_km or (found['distance_km'].max() if not found.empty else 0)
+    m = create_base_map((lat, lon), zoom_for_radius(reach or 500))
+    if radius_km:
+        folium.Circle([lat, lon], radius=radius_km * 1000, color='#1f77b4', fill=True, fill_opacity=0.05).add_to(m)
+    folium.CircleMarker([lat, lon], radius=5, color='#2c3e50', fill=True, fill_opacity=1).add_to(m)
+
+    colors = get_model_colors()
+    for row in found.itertuples(index=False):
+        models = mask_to_models(row.model_mask)
+        folium.CircleMarker(
+            [row.latitude, row.longitude],
+            radius=7,
+            color=colors[models[0]] if models else '#808080',
+            fill=True,
+            fill_opacity=0.8,
+            popup=folium.Popup(
+                f"<a href='?selected_language={row.id}' target='_top'>{html.escape(row.name)}</a>"
+                f"<br>{row.distance_km:.0f} km", max_width=250
+            ),
+        ).add_to(m)
+    components.html(folium.Figure().add_child(m).render(), width=MAP_WIDTH, height=MAP_HEIGHT + 10)
+
+@st.fragment
+def render_nearby_page(languages, model_types):
+    """Render the proximity search: controls, results table and map overlay.
+
+    A fragment, so changing a control reruns only this page's body.
+    """
+    st.title("Languages Near a Point")
+    index = get_spatial_index()
+    if len(index) == 0:
+        st.info("No languages have coordinates yet.")
+        return
+
+    controls, results = st.columns([0.3, 0.7])
+    with controls:
+        center = st.radio("Search around", CENTER_MODES, horizontal=True, key="nearby-center")
+        exclude_id = None
+        if center == CENTER_MODES[0]:
+            located = languages[languages['latitude'].notna() & languages['longitude'].notna()]
+            located = located.sort_values('name')
+            names = dict(zip(located['id'].tolist(), located['name'].tolist()))
+            exclude_id = st.selectbox("Language", list(names), format_func=names.get, key="nearby-language")
+            row = located[located['id'] == exclude_id].iloc[0]
+            lat, lon = float(row['latitude']), float(row['longitude'])
+        else:
+            lat = st.number_input("Latitude", -90.0, 90.0, 0.0, step=1.0, key="nearby-lat")
+            lon = st.number_input("Longitude", -180.0, 180.0, 20.0, step=1.0, key="nearby-lon")
+
+        mode = st.radio("Find", SEARCH_MODES, key="nearby-mode")
+        radius_km = k = None
+        if mode == SEARCH_MODES[0]:
+            radius_km = st.slider("Radius (km)", 50, 5000, 500, step=50, key="nearby-radius")
+        else:
+            k = int(st.number_input("Languages", 1, 100, 10, key="nearby-k"))
+
+        st.markdown("### Model Types")
+        selected_models = render_model_filters(model_types)
+
+    found = search_nearby(index, lat, lon, mode, radius_km, k, selected_models, exclude_id)
+
+    with results:
+        if found.empty:
+            st.info("No languages match this search.")
+        render_nearby_map(lat, lon, found, radius_km)
+        if not found.empty:
+            table = found[['name', 'distance_km']].assign(
+                models=[', '.join(mask_to_models(mask)) or '–' for mask in found['model_mask']]
+            )
+            st.dataframe(
+                table.style.format({'distance_km': '{:.0f}'}),
+                use_container_width=True, hide_index=True
+            )
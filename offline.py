@@ -0,0 +1,312 @@
+import argparse
+import os
+import re
+import struct
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+from pair_store import PairStore
+
+# Directory holding the offline tables, one Arrow IPC file per table
+OFFLINE_DIR_ENV = 'OFFLINE_SNAPSHOT_DIR'
+DEFAULT_OFFLINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'offline')
+
+# Column types of the tables the dashboard reads. language_new's geography
+# column is stored as plain latitude and longitude.
+TABLE_COLUMNS = {
+    'language_new': {
+        'id': 'int', 'lang_name': 'str', 'iso_code': 'str', 'glottocode': 'str',
+        'lang_fam_id': 'int', 'lang_sub_id': 'int', 'geo_center': 'str',
+        'latitude': 'float', 'longitude': 'float',
+        'asr': 'bool', 'asr_url': 'str', 'nmt': 'bool', 'nmt_url': 'str',
+        'tts': 'bool', 'tts_url': 'str',
+    },
+    'language_family': {'id': 'int', 'name': 'str'},
+    'language_subfamily': {'id': 'int', 'name': 'str', 'family_id': 'int'},
+    'nmt_pairs_source': {
+        'source_lang_id': 'int', 'target_lang_id': 'int',
+        'chrf_plus': 'float', 'spbleu_spm_200': 'float',
+    },
+}
+
+BOOL_VALUES = {'t': True, 'f': False, True: True, False: False}
+
+COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+def columns_of(table):
+    """Column names of an offline table."""
+    return list(TABLE_COLUMNS[table])
+
+def offline_dir():
+    """Return the directory the offline backend reads from."""
+    return os.getenv(OFFLINE_DIR_ENV) or DEFAULT_OFFLINE_DIR
+
+def _unescape_copy_value(value):
+    """Decode one field of pg_dump's COPY text format; \\N is NULL."""
+    if value == '\\N':
+        return None
+    if '\\' not in value:
+        return value
+
+    def replace(match):
+        escape = match.group(1)
+        if escape in COPY_ESCAPES:
+            return COPY_ESCAPES[escape]
+        if escape[0] == 'x':
+            return chr(int(escape[1:], 16))
+        if escape[0].isdigit():
+            return chr(int(escape, 8))
+        return escape
+    return re.sub(r'\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)', replace, value)
+
+def decode_ewkb_point(value):
+    """Return (latitude, longitude) of a hex EWKB point, or (None, None)."""
+    if not value:
+        return None, None
+    data = bytes.fromhex(value)
+    order = '<' if data[0] == 1 else '>'
+    geometry_type, = struct.unpack(order + 'I', data[1:5])
+    offset = 9 if geometry_type & 0x20000000 else 5
+    if geometry_type & 0xFFFF != 1:
+        return None, None
+    x, y = struct.unpack(order + 'dd', data[offset:offset + 16])
+    return y, x
+
+def _typed_frame(table, df):
+    """Return df's columns for a table, converted to the offline column types."""
+    columns = {}
+    for column, kind in TABLE_COLUMNS[table].items():
+        values = df[column] if column in df else pd.Series(None, index=df.index, dtype=object)
+        if kind == 'int':
+            columns[column] = pd.to_numeric(values).astype('Int64')
+        elif kind == 'float':
+            columns[column] = pd.to_numeric(values).astype('float64')
+        elif kind == 'bool':
+            columns[column] = values.map(BOOL_VALUES).astype('boolean')
+        else:
+            columns[column] = values.astype(object).where(values.notna(), None)
+    return pd.DataFrame(columns, index=df.index)
+
+def _drop_unlinked_pairs(tables):
+    """Drop pairs linked to no language at all, whichever source built the tables."""
+    pairs = tables['nmt_pairs_source']
+    linked = pairs['source_lang_id'].notna() | pairs['target_lang_id'].notna()
+    tables['nmt_pairs_source'] = pairs[linked].reset_index(drop=True)
+    return tables
+
+def tables_from_dump(path):
+    """Read the offline tables from the COPY blocks of a plain-text pg_dump file."""
+    header = re.compile(r'^COPY (?:public\.)?"?(\w+)"? \((.*)\) FROM stdin;$')
+    records = {table: [] for table in TABLE_COLUMNS}
+    table = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if table is None:
+                match = header.match(line)
+                if match and match.group(1) in TABLE_COLUMNS:
+                    table = match.group(1)
+                    columns = [c.strip().strip('"') for c in match.group(2).split(',')]
+                continue
+            if line == '\\.':
+                table = None
+                continue
+
+            row = dict(zip(columns, map(_unescape_copy_value, line.split('\t'))))
+            if table == 'language_new':
+                row['latitude'], row['longitude'] = decode_ewkb_point(row.pop('coordinates', None))
+            records[table].append(row)
+    return _drop_unlinked_pairs({
+        table: _typed_frame(table, pd.DataFrame.from_records(rows, columns=columns_of(table)))
+        for table, rows in records.items()
+    })
+
+def tables_from_database(connection):
+    """Read the offline tables from a running database."""
+    language_columns = ', '.join(c for c in TABLE_COLUMNS['language_new'] if c not in ('latitude', 'longitude'))
+    queries = {
+        'language_new': f"""
+            SELECT {language_columns},
+                ST_Y(coordinates::geometry) as latitude,
+                ST_X(coordinates::geometry) as longitude
+            FROM language_new
+            """,
+        'language_family': "SELECT id, name FROM language_family",
+        'language_subfamily': "SELECT id, name, family_id FROM language_subfamily",
+        'nmt_pairs_source': """
+            SELECT
+                source_lang_id,
+                target_lang_id,
+                chrf_plus::float8 as chrf_plus,
+                spbleu_spm_200::float8 as spbleu_spm_200
+            FROM nmt_pairs_source
+            """,
+    }
+    return _drop_unlinked_pairs({
+        table: _typed_frame(table, pd.read_sql(text(query), connection))
+        for table, query in queries.items()
+    })
+
+def write_offline_tables(tables, directory):
+    """Write each table to <directory>/<table>.arrow."""
+    os.makedirs(directory, exist_ok=True)
+    for table, df in tables.items():
+        path = os.path.join(directory, f"{table}.arrow")
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(tmp_path, path)
+
+def read_offline_tables(directory):
+    """Read the offline tables written by write_offline_tables."""
+    tables = {}
+    for table in TABLE_COLUMNS:
+        path = os.path.join(directory, f"{table}.arrow")
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"Offline snapshot table {path} is missing; build it with: python offline.py --from-dump <file>"
+            )
+        with pa.memory_map(path, 'r') as source:
+            tables[table] = _typed_frame(table, pa.ipc.open_file(source).read_all().to_pandas())
+    return tables
+
+def offline_generation(directory):
+    """Generation token of the offline tables: the newest file modification time."""
+    paths = [os.path.join(directory, f"{table}.arrow") for table in TABLE_COLUMNS]
+    return max((os.stat(path).st_mtime_ns for path in paths if os.path.exists(path)), default=0)
+
+class OfflineDataset:
+    """The dashboard's queries answered from in-memory copies of the tables."""
+
+    def __init__(self, tables):
+        self.languages = tables['language_new']
+        self.families = tables['language_family']
+        self.subfamilies = tables['language_subfamily']
+        self.pairs = tables['nmt_pairs_source']
+
+    def pair_store(self):
+        """PairStore over the pairs with both language ids, as load_pair_store builds it."""
+        linked = self.pairs.dropna(subset=['source_lang_id', 'target_lang_id'])
+        return PairStore(
+            linked['source_lang_id'].to_numpy(dtype=np.int64),
+            linked['target_lang_id'].to_numpy(dtype=np.int64),
+            linked['chrf_plus'].to_numpy(dtype=np.float64, na_value=np.nan),
+            linked['spbleu_spm_200'].to_numpy(dtype=np.float64, na_value=np.nan),
+            self.languages['id'].to_numpy(dtype=np.int64),
+            self.languages['lang_name'].to_numpy(dtype=object)
+        )
+
+    def language_frame(self):
+        """The rows of language_connection_snapshot, ordered by name."""
+        languages = self.languages
+        located = languages[
+            languages['latitude'].between(-90, 90) & languages['longitude'].between(-180, 180)
+        ]
+
+        # Pair counts: a self-pair counts once, as in the view's pair_counts
+        source = self.pairs['source_lang_id']
+        target = self.pairs['target_lang_id']
+        ids = pd.concat([source, target[target.ne(source).fillna(True)]]).dropna()
+        pair_counts = ids.value_counts()
+
+        # Languages with a partner that has coordinates, as in the view's connected
+        partners = pd.concat([
+            pd.DataFrame({'lang_id': source, 'partner_id': target}),
+            pd.DataFrame({'lang_id': target, 'partner_id': source}),
+        ]).dropna()
+        partners = partners[partners['lang_id'] != partners['partner_id']]
+        mapped = languages.loc[languages['latitude'].notna() & languages['longitude'].notna(), 'id']
+        connected = set(partners.loc[partners['partner_id'].isin(mapped), 'lang_id'].astype(int))
+
+        rows = []
+        for language in located.itertuples(index=False):
+            asr, nmt, tts = (bool(language.asr is True), bool(language.nmt is True), bool(language.tts is True))
+            rows.append({
+                'id': int(language.id),
+                'name': language.lang_name,
+                'iso_code': language.iso_code,
+                'latitude': float(language.latitude),
+                'longitude': float(language.longitude),
+                'available_models': ['ASR' if asr else None, 'NMT' if nmt else None, 'TTS' if tts else None],
+                'model_mask': asr | nmt << 1 | tts << 2,
+                'nmt_pair_count': int(pair_counts.get(language.id, 0)),
+                'has_nmt_pair': int(language.id) in connected,
+            })
+
+        df = pd.DataFrame(rows, columns=[
+            'id', 'name', 'iso_code', 'latitude', 'longitude', 'available_models', 'model_mask',
+            'nmt_pair_count', 'has_nmt_pair'
+        ])
+        df['model_mask'] = df['model_mask'].astype(np.int16)
+        return df.sort_values('name', kind='stable', ignore_index=True)
+
+    def language_details(self, language_id):
+        """The row get_language_details selects, or None if the id is unknown."""
+        language = self.languages[self.languages['id'] == language_id]
+        if language.empty:
+            return None
+        row = language.merge(
+            self.families.rename(columns={'id': 'family_id', 'name': 'family_name'}),
+            how='left', left_on='lang_fam_id', right_on='family_id'
+        ).merge(
+            self.subfamilies[['id', 'name']].rename(columns={'id': 'subfamily_id', 'name': 'subfamily_name'}),
+            how='left', left_on='lang_sub_id', right_on='subfamily_id'
+        )
+        details = row[[
+            'id', 'lang_name', 'iso_code', 'glottocode', 'family_name', 'family_id',
+            'subfamily_name', 'subfamily_id', 'asr', 'nmt', 'tts', 'asr_url', 'nmt_url',
+            'tts_url', 'geo_center', 'latitude', 'longitude'
+        ]].astype(object).iloc[0]
+        # Plain None for NULLs so truth tests behave like the database row
+        return details.where(details.notna(), None)
+
+    def language_groups(self):
+        """Languages with family and subfamily, as LANGUAGE_GROUPS_QUERY returns them."""
+        groups = self.languages[['id', 'lang_name', 'lang_fam_id', 'lang_sub_id']].merge(
+            self.families.rename(columns={'id': 'lang_fam_id', 'name': 'family_name'}),
+            how='left', on='lang_fam_id'
+        ).merge(
+            self.subfamilies[['id', 'name']].rename(columns={'id': 'lang_sub_id', 'name': 'subfamily_name'}),
+            how='left', on='lang_sub_id'
+        )
+        return groups.rename(columns={
+            'lang_name': 'name', 'lang_fam_id': 'family_id', 'lang_sub_id': 'subfamily_id'
+        }).sort_values('id', ignore_index=True)
+
+    def _languages_where(self, column, value):
+        """Names and ids of the languages with column equal to value, by name."""
+        languages = self.languages[self.languages[column] == value]
+        return languages[['lang_name', 'id']].rename(columns={'lang_name': 'name'}).sort_values(
+            'name', ignore_index=True
+        )
+
+    def family_languages(self, family_id):
+        """Languages in a family, as get_family_languages returns them."""
+        return self._languages_where('lang_fam_id', family_id)
+
+    def subfamily_languages(self, subfamily_id):
+        """Languages in a subfamily, as get_subfamily_languages returns them."""
+        return self._languages_where('lang_sub_id', subfamily_id)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline snapshot the dashboard runs from without Postgres.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--from-dump', metavar='FILE', help="plain-text pg_dump file, e.g. local_db_backup.sql")
+    source.add_argument('--from-db', action='store_true', help="read the database configured in the environment")
+    parser.add_argument('--out', default=offline_dir(), help=f"output directory (default: ${OFFLINE_DIR_ENV} or data/offline)")
+    args = parser.parse_args()
+
+    if args.from_dump:
+        tables = tables_from_dump(args.from_dump)
+    else:
+        from init_db import get_engine
+        with get_engine().connect() as connection:
+            tables = tables_from_database(connection)
+
+    write_offline_tables(tables, args.out)
+    for table, df in tables.items():
+        print(f"{table}: {len(df)} rows")
+    print(f"Wrote offline snapshot to {args.out}")
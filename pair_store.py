@@ -0,0 +1,171 @@
+import sys
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+ROLES = np.array(['Source', 'Target'], dtype=object)
+
+# Columns the all-pairs table can be sorted on
+SORT_COLUMNS = ['chrf_score', 'bleu_score', 'source_language', 'target_language']
+
+class PairStore:
+    """Columnar, process-wide copy of nmt_pairs_source with a per-language CSR index."""
+
+    def __init__(self, source_ids, target_ids, chrf, bleu, language_ids, language_names, index=None):
+        self.source_ids = np.asarray(source_ids, dtype=np.int64)
+        self.target_ids = np.asarray(target_ids, dtype=np.int64)
+        self.chrf = np.asarray(chrf, dtype=np.float64)
+        self.bleu = np.asarray(bleu, dtype=np.float64)
+
+        # Sorted language ids so an id maps to its position with searchsorted
+        order = np.argsort(language_ids)
+        self.language_ids = np.asarray(language_ids, dtype=np.int64)[order]
+        self.language_names = np.asarray(language_names, dtype=object)[order]
+
+        # index passes prebuilt (score_order, edge_row, edge_role, index_ids,
+        # offsets), e.g. mapped from a snapshot, instead of sorting again
+        if index is not None:
+            self.score_order, self.edge_row, self.edge_role, self.index_ids, self.offsets = index
+        else:
+            # NULL scores sort last, matching "ORDER BY chrf_plus DESC NULLS LAST"
+            chrf_key = np.where(np.isnan(self.chrf), np.inf, -self.chrf)
+            self.score_order = np.argsort(chrf_key, kind='stable')
+            self._build_index(chrf_key)
+        self._sort_orders = {}
+
+    def _build_index(self, chrf_key):
+        """Build the CSR offsets so each language's pairs are one contiguous slice."""
+        rows = np.arange(len(self.source_ids))
+        # A self-pair is listed once, as Source, like the SQL CASE expression
+        not_self = self.source_ids != self.target_ids
+        edge_lang = np.concatenate([self.source_ids, self.target_ids[not_self]])
+        edge_row = np.concatenate([rows, rows[not_self]])
+        edge_role = np.concatenate([
+            np.zeros(len(rows), dtype=np.int8),
+            np.ones(int(not_self.sum()), dtype=np.int8)
+        ])
+
+        # Within a language: Source before Target, then best chrF++ first
+        order = np.lexsort((chrf_key[edge_row], edge_role, edge_lang))
+        self.edge_row = edge_row[order]
+        self.edge_role = edge_role[order]
+        edge_lang = edge_lang[order]
+
+        self.index_ids = np.unique(edge_lang)
+        counts = np.bincount(np.searchsorted(self.index_ids, edge_lang), minlength=len(self.index_ids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the store's arrays."""
+        arrays = [
+            self.source_ids, self.target_ids, self.chrf, self.bleu, self.score_order,
+            self.edge_row, self.edge_role, self.index_ids, self.offsets, self.language_ids
+        ]
+        names = sum(sys.getsizeof(name) for name in self.language_names)
+        return int(sum(a.nbytes for a in arrays) + self.language_names.nbytes + names)
+
+    def names_for(self, ids):
+        """Look up language names for an array of ids, None where unknown."""
+        if len(self.language_ids) == 0:
+            return np.full(len(ids), None, dtype=object)
+        pos = np.clip(np.searchsorted(self.language_ids, ids), 0, len(self.language_ids) - 1)
+        found = self.language_ids[pos] == ids
+        return np.where(found, self.language_names[pos], None)
+
+    def language_slice(self, language_id):
+        """Return the (start, end) range of a language's pairs in the CSR index."""
+        pos = np.searchsorted(self.index_ids, language_id)
+        if pos >= len(self.index_ids) or self.index_ids[pos] != language_id:
+            return 0, 0
+        return self.offsets[pos], self.offsets[pos + 1]
+
+    def pair_count(self, language_id):
+        """Number of pairs a language takes part in."""
+        start, end = self.language_slice(language_id)
+        return int(end - start)
+
+    def rows_frame(self, rows):
+        """Materialize the given pair rows in the all-pairs DataFrame shape."""
+        return pd.DataFrame({
+            'chrf_score': self.chrf[rows],
+            'bleu_score': self.bleu[rows],
+            'source_language': self.names_for(self.source_ids[rows]),
+            'target_language': self.names_for(self.target_ids[rows]),
+        })
+
+    def language_pairs(self, language_id):
+        """Pairs for one language, shaped like the per-language SQL query."""
+        start, end = self.language_slice(language_id)
+        df = self.rows_frame(self.edge_row[start:end])
+        df['role'] = ROLES[self.edge_role[start:end]]
+        return df
+
+    def all_pairs(self):
+        """All pairs ordered by chrF++, shaped like the all-pairs SQL query."""
+        return self.rows_frame(self.score_order)
+
+    def _name_ranks(self, ids):
+        """Alphabetical rank of each id's language name; unknown names rank last."""
+        ranks = np.empty(len(self.language_names), dtype=np.int64)
+        ranks[np.argsort(self.language_names.astype(str), kind='stable')] = np.arange(len(ranks))
+        if len(self.language_ids) == 0:
+            return np.zeros(len(ids), dtype=np.int64)
+        pos = np.clip(np.searchsorted(self.language_ids, ids), 0, len(self.language_ids) - 1)
+        return np.where(self.language_ids[pos] == ids, ranks[pos], len(ranks))
+
+    def sort_order(self, sort_by='chrf_score', ascending=False):
+        """Row permutation for a sort column and direction, computed once and reused."""
+        key = (sort_by, ascending)
+        if key not in self._sort_orders:
+            if sort_by in ('chrf_score', 'bleu_score'):
+                values = self.chrf if sort_by == 'chrf_score' else self.bleu
+                values = values if ascending else -values
+                # NaN keys land last in either direction
+                order = np.argsort(values, kind='stable')
+            else:
+                ids = self.source_ids if sort_by == 'source_language' else self.target_ids
+                ranks = self._name_ranks(ids)
+                if not ascending:
+                    # Reverse known names but keep unknown ones last
+                    known = len(self.language_names)
+                    ranks = np.where(ranks < known, known - 1 - ranks, known)
+                order = np.argsort(ranks, kind='stable')
+            self._sort_orders[key] = order
+        return self._sort_orders[key]
+
+    def search_mask(self, search):
+        """Boolean row mask of pairs whose source or target name contains search."""
+        if not search:
+            return np.ones(len(self.source_ids), dtype=bool)
+        # Match against the few hundred language names, not every pair row
+        names = pd.Series(self.language_names, dtype=object)
+        matched = self.language_ids[names.str.contains(search, case=False, regex=False, na=False).to_numpy()]
+        return np.isin(self.source_ids, matched) | np.isin(self.target_ids, matched)
+
+    def matching_rows(self, search='', sort_by='chrf_score', ascending=False):
+        """Row numbers of pairs matching search, in the requested order."""
+        order = self.sort_order(sort_by, ascending)
+        return order[self.search_mask(search)[order]]
+
+def load_pair_store(connection):
+    """Read nmt_pairs_source and language names in two queries and build a PairStore."""
+    pairs = pd.read_sql(text("""
+        SELECT
+            source_lang_id,
+            target_lang_id,
+            chrf_plus::float8 as chrf_plus,
+            spbleu_spm_200::float8 as spbleu_spm_200
+        FROM nmt_pairs_source
+        WHERE source_lang_id IS NOT NULL
+            AND target_lang_id IS NOT NULL
+        """), connection)
+    languages = pd.read_sql(text("SELECT id, lang_name FROM language_new"), connection)
+    return PairStore(
+        pairs['source_lang_id'].to_numpy(),
+        pairs['target_lang_id'].to_numpy(),
+        pairs['chrf_plus'].to_numpy(dtype=np.float64, na_value=np.nan),
+        pairs['spbleu_spm_200'].to_numpy(dtype=np.float64, na_value=np.nan),
+        languages['id'].to_numpy(),
+        languages['lang_name'].to_numpy(dtype=object)
+    )
@@ -0,0 +1,374 @@
+import io
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from staging import DATASET_OBJECT, DATASET_TABLES, STAGING_SCHEMA
+
+# Uploads are copied to disk in chunks of this size
+CHUNK_SIZE = 1024 * 1024
+
+# Dump formats, as detected from the file header
+PLAIN = 'plain'
+CUSTOM = 'custom'
+TAR = 'tar'
+
+# Object header comments in pg_dump and pg_restore SQL output
+SECTION_HEADER = re.compile(r'^-- (?:Data for )?Name: (.+?); Type: .+?; Schema: (.*?); Owner:')
+
+# Ownership changes; roles from the dumping server may not exist here
+OWNER_LINE = re.compile(r'^ALTER \w+(?: \w+)? \S+ OWNER TO ')
+
+# Schema-qualified references to dataset tables and their sequences
+PUBLIC_OBJECT = re.compile(r'\bpublic\.("?)((?:%s)(?:_\w*)?)\b' % '|'.join(DATASET_TABLES))
+
+# A table the dump itself creates
+CREATE_TABLE = re.compile(r'^CREATE TABLE public\."?(\w+)"? ')
+
+# pg_restore --list entries for dataset objects: "<id>; <oid> <oid> <type> public <name> ..."
+TOC_ENTRY = re.compile(
+    r'^\d+; \d+ \d+ (TABLE DATA|SEQUENCE SET|SEQUENCE OWNED BY|FK CONSTRAINT|TABLE|SEQUENCE|DEFAULT'
+    r'|CONSTRAINT|INDEX|TRIGGER) public (\S+)'
+)
+
+# Entry types restored one per worker after the definitions, in this order;
+# foreign keys wait for the primary keys they reference.
+PARALLEL_PHASES = [
+    ('table data', ('TABLE DATA', 'SEQUENCE SET')),
+    ('indexes and constraints', ('INDEX', 'CONSTRAINT', 'TRIGGER')),
+    ('foreign keys', ('FK CONSTRAINT',)),
+]
+
+def save_upload(uploaded_file, directory=None):
+    """Copy an uploaded file to a temporary path in chunks and return the path."""
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, dir=directory, suffix='.dump') as tmp_file:
+        shutil.copyfileobj(uploaded_file, tmp_file, CHUNK_SIZE)
+        return tmp_file.name
+
+def detect_format(path):
+    """Tell a custom-format or tar archive from a plain SQL dump by its header."""
+    with open(path, 'rb') as f:
+        header = f.read(512)
+    if header.startswith(b'PGDMP'):
+        return CUSTOM
+    if header[257:262] == b'ustar':
+        return TAR
+    return PLAIN
+
+def default_jobs():
+    """Parallel pg_restore workers: RESTORE_JOBS, or one per CPU up to 4."""
+    return int(os.getenv('RESTORE_JOBS') or min(4, os.cpu_count() or 1))
+
+def connection_options():
+    """psql/pg_restore connection arguments and environment from the PG* variables."""
+    env = os.environ.copy()
+    env['PGPASSWORD'] = os.getenv('PGPASSWORD') or ''
+    options = [
+        '-h', os.getenv('PGHOST'),
+        '-p', os.getenv('PGPORT'),
+        '-U', os.getenv('PGUSER'),
+        '-d', os.getenv('PGDATABASE')
+    ]
+    return options, env
+
+def count_toc_entries(path, env):
+    """Number of entries in an archive's table of contents, for progress."""
+    result = subprocess.run(['pg_restore', '--list', path], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return 0
+    return sum(1 for line in result.stdout.splitlines() if line and not line.startswith(';'))
+
+def list_entries(path, env):
+    """Dataset entries of an archive's table of contents, as (type, name, line)."""
+    result = subprocess.run(['pg_restore', '--list', path], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"pg_restore --list exited with status {result.returncode}: {result.stderr.strip()}")
+    entries = []
+    for line in result.stdout.splitlines():
+        entry = TOC_ENTRY.match(line)
+        if entry and DATASET_OBJECT.match(entry.group(2)):
+            entries.append((entry.group(1), entry.group(2), line))
+    return entries
+
+def restore_phases(entries):
+    """Split TOC entries into (phase, batches) in restore order.
+
+    Definitions are one batch, restored by a single worker; every later
+    entry is its own batch, so a phase's entries can run side by side.
+    """
+    parallel = {kind for _, kinds in PARALLEL_PHASES for kind in kinds}
+    phases = [('table definitions', [[line for kind, _, line in entries if kind not in parallel]])]
+    for phase, kinds in PARALLEL_PHASES:
+        phases.append((phase, [[line] for kind, _, line in entries if kind in kinds]))
+    return [(phase, batches) for phase, batches in phases if any(batches)]
+
+def owning_table(name):
+    """The dataset table an object is named after, e.g. nmt_pairs_source for nmt_pairs_source_pkey."""
+    matches = [t for t in DATASET_TABLES if name == t or name.startswith(t + '_')]
+    return max(matches, key=len) if matches else None
+
+def stage_dump(lines, schema=STAGING_SCHEMA, tables=None):
+    """Filter plain dump SQL to the dataset tables and retarget them at schema.
+
+    pg_dump and pg_restore output mark every object with a "-- Name: ...;
+    Type: ...; Schema: ..." header. Sections for dataset tables in public
+    and their sequences, constraints and indexes are kept, with
+    public.<object> rewritten to <schema>.<object>; extensions, PostGIS
+    tables, ACLs and ownership changes are dropped. COPY data passes through
+    unchanged.
+
+    Only tables the dump creates are retargeted. References to dataset
+    tables it leaves out, such as the foreign keys of a pairs-only backup to
+    public.language_new, keep pointing at the live copy. tables names them
+    up front for SQL that does not include the CREATE TABLE statements, such
+    as a single archive entry.
+    """
+    keep = True
+    in_copy = False
+    created = set(tables or ())
+
+    def retarget(match):
+        if owning_table(match.group(2)) not in created:
+            return match.group(0)
+        return f"{schema}.{match.group(1)}{match.group(2)}"
+
+    for line in lines:
+        if in_copy:
+            if keep:
+                yield line
+            if line.rstrip('\r\n') == '\\.':
+                in_copy = False
+            continue
+
+        header = SECTION_HEADER.match(line)
+        if header:
+            name, object_schema = header.groups()
+            keep = object_schema == 'public' and bool(DATASET_OBJECT.match(name.split(' ')[0]))
+        if line.startswith('COPY '):
+            in_copy = True
+        if keep and not OWNER_LINE.match(line):
+            table = CREATE_TABLE.match(line)
+            if table:
+                created.add(table.group(1))
+            yield PUBLIC_OBJECT.sub(retarget, line)
+
+class RestoreJob:
+    """A staged restore running in a background thread, with progress the UI can poll.
+
+    The dump is filtered through stage_dump and streamed into psql, so only
+    the dataset tables are loaded, into the staging schema, and the live
+    tables are untouched. Custom and tar archives are first turned back into
+    SQL by pg_restore. Custom archives are restored by jobs workers, like
+    pg_restore --jobs, each turning part of the table of contents into SQL.
+    Progress is the share of bytes read for plain dumps and of TOC entries
+    handled for archives.
+
+    before and after are called with the job around the load, after only if
+    it succeeded; cleanup is always called last.
+    """
+
+    def __init__(self, path, fmt=None, jobs=None, schema=STAGING_SCHEMA, before=None, after=None, cleanup=None,
+                 name=None):
+        self.path = path
+        self.format = fmt or detect_format(path)
+        self.jobs = jobs or default_jobs()
+        self.schema = schema
+        self.before = before
+        self.after = after
+        self.cleanup = cleanup
+        self.name = name or os.path.basename(path)
+        self.size = os.path.getsize(path)
+
+        self.status = 'pending'
+        self.stage = 'Waiting to start'
+        self.progress = 0.0
+        self.error = None
+        self.log = deque(maxlen=500)
+        self.started_at = None
+        self.finished_at = None
+        self._thread = None
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed')
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def set_stage(self, stage):
+        """Record the current step for the progress display."""
+        self.stage = stage
+        self.log.append(stage)
+
+    def start(self):
+        """Run the restore in a daemon thread and return immediately."""
+        self.started_at = time.monotonic()
+        self.status = 'running'
+        self._thread = threading.Thread(target=self._run, name=f"restore-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            if self.before:
+                self.before(self)
+            self._load()
+            if self.after:
+                self.after(self)
+        except Exception as e:
+            self.error = str(e)
+            self.log.append(f"ERROR: {e}")
+
+        try:
+            if self.cleanup:
+                self.cleanup(self)
+        except Exception as e:
+            self.log.append(f"ERROR during cleanup: {e}")
+
+        self.status = 'failed' if self.error else 'succeeded'
+        self.finished_at = time.monotonic()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _collect(self, stream):
+        """Append a process's output lines to the log as they arrive."""
+        for line in stream:
+            line = line.rstrip()
+            if line:
+                self.log.append(line)
+
+    def _reader(self, stream):
+        """Start a thread logging a process's stderr so a full pipe never stalls it."""
+        reader = threading.Thread(
+            target=self._collect, args=(io.TextIOWrapper(stream, errors='replace'),), daemon=True
+        )
+        reader.start()
+        return reader
+
+    def _plain_lines(self):
+        """Lines of a plain dump, advancing progress by bytes read."""
+        read = 0
+        with open(self.path, 'rb') as f:
+            for raw in f:
+                read += len(raw)
+                self.progress = read / self.size
+                yield raw.decode('utf-8', 'surrogateescape')
+
+    def _archive_lines(self, env, listing=None):
+        """SQL lines pg_restore produces from an archive, advancing progress by TOC entry.
+
+        With listing, only the entries in that TOC list file are produced and
+        progress is left to the caller.
+        """
+        total = count_toc_entries(self.path, env) if listing is None else 0
+        command = ['pg_restore', '--no-owner', '--no-privileges', '-f', '-']
+        if listing is not None:
+            command += ['-L', listing]
+        process = subprocess.Popen(
+            [*command, self.path], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        reader = self._reader(process.stderr)
+        seen = 0
+        finished = False
+        try:
+            for raw in process.stdout:
+                line = raw.decode('utf-8', 'surrogateescape')
+                if listing is None and line.startswith('-- ') and SECTION_HEADER.match(line):
+                    seen += 1
+                    self.progress = min(seen / total, 0.99) if total else 0.0
+                yield line
+            finished = True
+        finally:
+            # Stop pg_restore if psql gave up before reading everything
+            if not finished:
+                process.kill()
+                process.wait()
+        returncode = process.wait()
+        reader.join()
+        if returncode != 0:
+            raise RuntimeError(f"pg_restore exited with status {returncode}")
+
+    def _load(self):
+        """Stream the filtered dump into psql, stopping at the first error."""
+        options, env = connection_options()
+        # Tar archives can only be read front to back, so only custom ones go parallel
+        if self.format == CUSTOM and self.jobs > 1:
+            self._load_parallel(options, env)
+            return
+        if self.format == PLAIN:
+            self.set_stage(f"Loading SQL dump ({self.size / 1024 / 1024:.1f} MB) into {self.schema}...")
+            lines = self._plain_lines()
+        else:
+            self.set_stage(f"Loading {self.format} archive into {self.schema} with pg_restore...")
+            lines = self._archive_lines(env)
+        self._psql(options, env, lines)
+        self.progress = 1.0
+
+    def _load_parallel(self, options, env):
+        """Load a custom archive's dataset entries into staging with jobs workers.
+
+        Mirrors pg_restore --jobs: definitions first, then each table's data,
+        then indexes and constraints, then foreign keys, with the entries of
+        a phase spread over the workers. Each worker runs pg_restore -L on its
+        entries and streams the SQL through stage_dump into its own psql.
+        """
+        entries = list_entries(self.path, env)
+        tables = {name for kind, name, _ in entries if kind == 'TABLE'}
+        phases = restore_phases(entries)
+        total = sum(len(batch) for _, batches in phases for batch in batches)
+        handled = 0
+
+        def restore_batch(listing):
+            self._psql(options, env, self._archive_lines(env, listing), tables)
+
+        with tempfile.TemporaryDirectory() as directory, ThreadPoolExecutor(self.jobs) as pool:
+            for phase, batches in phases:
+                self.set_stage(f"Loading {phase} into {self.schema} with pg_restore ({self.jobs} jobs)...")
+                futures = {}
+                for i, batch in enumerate(batches):
+                    listing = os.path.join(directory, f"{phase.replace(' ', '_')}-{i}.list")
+                    with open(listing, 'w') as f:
+                        f.write('\n'.join(batch) + '\n')
+                    futures[pool.submit(restore_batch, listing)] = len(batch)
+                # Later phases depend on this one, so it must finish cleanly first
+                for future in as_completed(futures):
+                    future.result()
+                    handled += futures[future]
+                    self.progress = min(handled / total, 0.99)
+        self.progress = 1.0
+
+    def _psql(self, options, env, lines, tables=None):
+        """Stream lines through stage_dump into a psql session, stopping at the first error."""
+        process = subprocess.Popen(
+            ['psql', *options, '-q', '-v', 'ON_ERROR_STOP=1', '-f', '-'],
+            env=env, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        reader = self._reader(process.stderr)
+        try:
+            for line in stage_dump(lines, self.schema, tables):
+                process.stdin.write(line.encode('utf-8', 'surrogateescape'))
+            process.stdin.close()
+        except BrokenPipeError:
+            # psql stopped on an error; its exit code and stderr explain why
+            pass
+        finally:
+            lines.close()
+        returncode = process.wait()
+        reader.join()
+        if returncode != 0:
+            raise RuntimeError(f"psql exited with status {returncode}")
@@ -0,0 +1,127 @@
+from collections import namedtuple
+import numpy as np
+
+# Hop limits precomputed per generation; 2 hops is one pivot, X→pivot→Y
+MAX_HOPS = 3
+
+# A translation route: language ids from source to target, the chrF++ of
+# each hop, and the weakest of them, which ranks routes
+Route = namedtuple('Route', ['path', 'hop_scores', 'bottleneck'])
+
+NO_EDGE = -np.inf
+
+class PivotRouter:
+    """Best pivot routes between languages by weakest-link chrF++.
+
+    Built from a ScoreMatrix. For each hop limit h up to MAX_HOPS,
+    bottleneck[h - 1][i, j] is the best weakest-hop score over routes from
+    language i to j of at most h hops, and via[h - 1][i, j] is the language
+    before j on that route, or -1 when it needs fewer hops. The unlimited
+    case comes from a max-min Floyd–Warshall pass with a successor matrix.
+    Scores are -inf where no route exists. Each table is one vectorized
+    pass per intermediate language, so a query is a few array lookups.
+    """
+
+    def __init__(self, matrix):
+        self.ids = matrix.ids
+        scores = np.where(np.isnan(matrix.chrf), NO_EDGE, matrix.chrf)
+        np.fill_diagonal(scores, NO_EDGE)
+        self.scores = scores
+        n = len(self.ids)
+
+        # Hop-limited: extend each best route of up to h - 1 hops by one last hop
+        self.bottleneck = [scores]
+        self.via = [np.full((n, n), -1, dtype=np.int32)]
+        for _ in range(1, MAX_HOPS):
+            previous = self.bottleneck[-1]
+            best = previous.copy()
+            via = np.full((n, n), -1, dtype=np.int32)
+            for k in range(n):
+                candidate = np.minimum(previous[:, k, None], scores[None, k, :])
+                better = candidate > best
+                best[better] = candidate[better]
+                via[better] = k
+            self.bottleneck.append(best)
+            self.via.append(via)
+
+        # Unlimited hops: max-min Floyd–Warshall
+        closure = scores.copy()
+        successor = np.where(scores > NO_EDGE, np.arange(n)[None, :], -1).astype(np.int32)
+        for k in range(n):
+            candidate = np.minimum(closure[:, k, None], closure[None, k, :])
+            better = candidate > closure
+            closure = np.where(better, candidate, closure)
+            successor = np.where(better, successor[:, k, None], successor)
+        self.closure = closure
+        self.successor = successor
+
+    def _position(self, language_id):
+        pos = np.searchsorted(self.ids, language_id)
+        if pos >= len(self.ids) or self.ids[pos] != language_id:
+            return None
+        return int(pos)
+
+    def _limited_path(self, i, j, hops):
+        """Positions along the best route of at most hops hops, from i to j."""
+        path = [j]
+        while hops > 1:
+            k = int(self.via[hops - 1][i, j])
+            hops -= 1
+            if k >= 0:
+                path.append(k)
+                j = k
+        path.append(i)
+        return path[::-1]
+
+    def _closure_path(self, i, j):
+        """Positions along the best unlimited route from i to j."""
+        path = [i]
+        while i != j:
+            i = int(self.successor[i, j])
+            path.append(i)
+        return path
+
+    def best_route(self, source_id, target_id, max_hops=None):
+        """Best route between two language ids, or None if there is none.
+
+        max_hops counts translations: 1 allows only the direct pair, 2 one
+        pivot, and so on up to MAX_HOPS; None allows any number. Among equal
+        bottlenecks the route with fewest hops wins when max_hops is set.
+        """
+        i, j = self._position(source_id), self._position(target_id)
+        if i is None or j is None or i == j:
+            return None
+        if max_hops is None:
+            if self.closure[i, j] == NO_EDGE:
+                return None
+            path = self._closure_path(i, j)
+        else:
+            hops = min(max(int(max_hops), 1), MAX_HOPS)
+            if self.bottleneck[hops - 1][i, j] == NO_EDGE:
+                return None
+            path = self._limited_path(i, j, hops)
+
+        hop_scores = [float(self.scores[a, b]) for a, b in zip(path, path[1:])]
+        return Route([int(self.ids[p]) for p in path], hop_scores, min(hop_scores))
+
+    def route_scores(self, source_id, max_hops=None):
+        """Best bottleneck score from one language to every other, aligned with ids.
+
+        NaN where there is no route or for the language itself.
+        """
+        i = self._position(source_id)
+        if i is None:
+            return np.full(len(self.ids), np.nan)
+        if max_hops is None:
+            row = self.closure[i]
+        else:
+            row = self.bottleneck[min(max(int(max_hops), 1), MAX_HOPS) - 1][i]
+        row = np.where(row == NO_EDGE, np.nan, row)
+        row[i] = np.nan
+        return row
+
+    @property
+    def nbytes(self):
+        """Memory held by the precomputed tables."""
+        tables = [self.scores, self.closure, self.successor, *self.bottleneck, *self.via]
+        return int(sum(t.nbytes for t in tables))
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+# Languages with their family and subfamily, for grouping the matrix
+LANGUAGE_GROUPS_QUERY = """
+    SELECT
+        l.id,
+        l.lang_name AS name,
+        l.lang_fam_id AS family_id,
+        lf.name AS family_name,
+        l.lang_sub_id AS subfamily_id,
+        ls.name AS subfamily_name
+    FROM language_new l
+    LEFT JOIN language_family lf ON l.lang_fam_id = lf.id
+    LEFT JOIN language_subfamily ls ON l.lang_sub_id = ls.id
+    ORDER BY l.id
+    """
+
+GROUP_COLUMNS = ['name', 'family_id', 'family_name', 'subfamily_id', 'subfamily_name']
+
+# Score matrices by metric name
+METRICS = {'chrF++': 'chrf', 'spBLEU': 'bleu'}
+
+class ScoreMatrix:
+    """Dense source-by-target chrF++ and spBLEU matrices over the languages that have pairs.
+
+    Row and column i belong to language ids[i]; a missing pair is NaN. When
+    a pair is listed twice, the later row wins. groups holds each language's
+    name, family and subfamily, aligned with ids.
+    """
+
+    def __init__(self, store, groups):
+        self.ids = store.index_ids
+        n = len(self.ids)
+        source = np.searchsorted(self.ids, store.source_ids)
+        target = np.searchsorted(self.ids, store.target_ids)
+
+        self.chrf = np.full((n, n), np.nan)
+        self.bleu = np.full((n, n), np.nan)
+        self.chrf[source, target] = store.chrf
+        self.bleu[source, target] = store.bleu
+
+        self.groups = (
+            groups.drop_duplicates('id').set_index('id')
+            .reindex(self.ids)[GROUP_COLUMNS]
+            .reset_index()
+        )
+        self.groups['name'] = self.groups['name'].fillna(self.groups['id'].astype(str))
+
+    def matrix(self, metric):
+        """The full matrix for a METRICS name."""
+        return getattr(self, METRICS[metric])
+
+    def positions(self, ids):
+        """Matrix positions of language ids; ids without pairs are dropped."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.zeros(0, dtype=np.int64)
+        pos = np.clip(np.searchsorted(self.ids, ids), 0, len(self.ids) - 1)
+        return pos[self.ids[pos] == ids]
+
+    def select(self, families=None, subfamilies=None):
+        """Positions of the languages in any of the given family or subfamily ids.
+
+        None for both selects every language.
+        """
+        if families is None and subfamilies is None:
+            return np.arange(len(self.ids))
+        keep = np.zeros(len(self.ids), dtype=bool)
+        if families is not None:
+            keep |= self.groups['family_id'].isin(families).to_numpy()
+        if subfamilies is not None:
+            keep |= self.groups['subfamily_id'].isin(subfamilies).to_numpy()
+        return np.flatnonzero(keep)
+
+    def order(self, positions, by='family', metric='chrF++'):
+        """Reorder positions: by 'family' (family, subfamily, name), 'name' or 'score'.
+
+        'score' puts the languages with the best mean score as source first.
+        Languages without a family or subfamily sort after those with one.
+        """
+        groups = self.groups.iloc[positions]
+        if by == 'score':
+            mean = self.row_stats(self.submatrix(positions, metric))['mean'].to_numpy()
+            return positions[np.argsort(np.where(np.isnan(mean), np.inf, -mean), kind='stable')]
+        keys = ['name'] if by == 'name' else ['family_name', 'subfamily_name', 'name']
+        order = np.lexsort([groups[key].fillna('\uffff').to_numpy(dtype=str) for key in reversed(keys)])
+        return positions[order]
+
+    def submatrix(self, positions, metric='chrF++'):
+        """Rows and columns of a metric's matrix at positions, in that order."""
+        return self.matrix(metric)[np.ix_(positions, positions)]
+
+    def names(self, positions):
+        """Language names at positions."""
+        return self.groups['name'].to_numpy()[positions]
+
+    @staticmethod
+    def _stats(values, axis):
+        """Count, mean, min and max along an axis, ignoring NaN without warnings."""
+        present = ~np.isnan(values)
+        count = present.sum(axis=axis)
+        total = np.where(present, values, 0.0).sum(axis=axis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        low = np.where(present, values, np.inf).min(axis=axis, initial=np.inf)
+        high = np.where(present, values, -np.inf).max(axis=axis, initial=-np.inf)
+        return pd.DataFrame({
+            'pairs': count,
+            'mean': mean,
+            'min': np.where(count > 0, low, np.nan),
+            'max': np.where(count > 0, high, np.nan),
+        })
+
+    def row_stats(self, values):
+        """Per-row statistics of a submatrix: the languages as source."""
+        return self._stats(values, axis=1)
+
+    def column_stats(self, values):
+        """Per-column statistics of a submatrix: the languages as target."""
+        return self._stats(values, axis=0)
+
+    def asymmetry(self, positions, metric='chrF++'):
+        """Pairs scored differently in each direction, with A→B minus B→A, largest gap first.
+
+        Each unordered pair appears once, with source the better direction.
+        """
+        values = self.submatrix(positions, metric)
+        gap = values - values.T
+        rows, columns = np.nonzero(gap > 0)
+        names = self.names(positions)
+        frame = pd.DataFrame({
+            'source_language': names[rows],
+            'target_language': names[columns],
+            'forward': values[rows, columns],
+            'backward': values[columns, rows],
+            'gap': gap[rows, columns],
+        })
+        return frame.sort_values('gap', ascending=False, ignore_index=True)
+
+    def long_frame(self, positions, metric='chrF++'):
+        """The scored cells of a submatrix as source, target, score rows."""
+        values = self.submatrix(positions, metric)
+        rows, columns = np.nonzero(~np.isnan(values))
+        names = self.names(positions)
+        return pd.DataFrame({
+            'source_language': names[rows],
+            'target_language': names[columns],
+            'score': values[rows, columns],
+        })
+
+    @property
+    def nbytes(self):
+        """Memory held by the two matrices."""
+        return int(self.chrf.nbytes + self.bleu.nbytes)
@@ -0,0 +1,176 @@
+import argparse
+import glob
+import os
+import numpy as np
+import pyarrow as pa
+from sqlalchemy import text
+from pair_store import PairStore, load_pair_store
+
+# Directory shared by every app replica on a node; unset disables snapshots
+SNAPSHOT_DIR_ENV = 'SNAPSHOT_DIR'
+
+# Bump when the layout of the snapshot files changes
+SNAPSHOT_FORMAT = 3
+
+# Columns of the language frame stored as Arrow list arrays
+LIST_COLUMNS = ['available_models']
+
+def snapshot_dir():
+    """Return the configured snapshot directory, or None when snapshots are off."""
+    return os.getenv(SNAPSHOT_DIR_ENV) or None
+
+def snapshot_version(generation):
+    """File version for a data generation tuple: v<SNAPSHOT_FORMAT>-<generation...>, e.g. (12, 34) -> 'v3-12-34'."""
+    return '-'.join([f"v{SNAPSHOT_FORMAT}", *(str(g) for g in generation)])
+
+def version_key(version):
+    """Format and generation numbers of a version string, or None if it is not one."""
+    try:
+        return tuple(int(part) for part in version.lstrip('v').split('-'))
+    except ValueError:
+        return None
+
+def is_older(version, than):
+    """True when version is an earlier format, or the same format at earlier generations."""
+    old, new = version_key(version), version_key(than)
+    if old is None or new is None or len(old) != len(new):
+        return False
+    if old[0] != new[0]:
+        return old[0] < new[0]
+    return old != new and all(o <= n for o, n in zip(old[1:], new[1:]))
+
+def snapshot_path(name, version, directory=None):
+    """Path of one snapshot file."""
+    return os.path.join(directory or snapshot_dir(), f"{name}-{version}.arrow")
+
+def write_table(name, version, table, directory=None):
+    """Write an Arrow IPC file atomically and remove older versions of it.
+
+    The file is written uncompressed so readers can map it without copying.
+    Replicas that still map an older version keep their pages until they
+    close it; removing the path does not affect them. Newer versions, from a
+    replica that already saw a later generation, are left alone.
+    """
+    directory = directory or snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(name, version, directory)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    prefix = f"{name}-"
+    for old in glob.glob(os.path.join(directory, f"{name}-v*.arrow")):
+        if is_older(os.path.basename(old)[len(prefix):-len('.arrow')], version):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
+def map_table(name, version, directory=None):
+    """Memory-map a snapshot file read-only; return None if it does not exist."""
+    path = snapshot_path(name, version, directory)
+    if not os.path.exists(path):
+        return None
+    source = pa.memory_map(path, 'r')
+    return pa.ipc.open_file(source).read_all()
+
+def write_language_snapshot(df, version, directory=None):
+    """Store the language frame as an Arrow IPC file."""
+    return write_table('languages', version, pa.Table.from_pandas(df, preserve_index=False), directory)
+
+def read_language_snapshot(version, directory=None):
+    """Load the language frame from a mapped snapshot, or None if missing.
+
+    The frame holds strings and lists, so it is converted into a private
+    copy; the file saves the query, not the memory.
+    """
+    table = map_table('languages', version, directory)
+    if table is None:
+        return None
+    df = table.drop_columns([c for c in LIST_COLUMNS if c in table.column_names]).to_pandas()
+    # List columns come back as Python lists, the same shape psycopg2 returns
+    for column in LIST_COLUMNS:
+        if column in table.column_names:
+            df[column] = table.column(column).to_pylist()
+    return df[table.column_names]
+
+def write_pair_snapshot(store, version, directory=None):
+    """Store a PairStore's pair arrays, its derived index arrays and language names."""
+    pairs = pa.table({
+        'source_lang_id': store.source_ids,
+        'target_lang_id': store.target_ids,
+        'chrf_plus': store.chrf,
+        'spbleu_spm_200': store.bleu,
+        'score_order': store.score_order.astype(np.int64),
+    })
+    edges = pa.table({'edge_row': store.edge_row.astype(np.int64), 'edge_role': store.edge_role})
+    # offsets has one more entry than index_ids; its first is always 0
+    index = pa.table({'index_id': store.index_ids, 'end': store.offsets[1:].astype(np.int64)})
+    languages = pa.table({
+        'id': store.language_ids,
+        'lang_name': pa.array(store.language_names.tolist(), type=pa.string()),
+    })
+    write_table('pair_languages', version, languages, directory)
+    write_table('pair_edges', version, edges, directory)
+    write_table('pair_index', version, index, directory)
+    return write_table('pairs', version, pairs, directory)
+
+def read_pair_snapshot(version, directory=None):
+    """Build a PairStore over mapped pair and index arrays, or return None if missing.
+
+    NULL scores are stored as NaN, so the pair columns and the CSR and
+    score-order arrays convert to NumPy without a copy and stay backed by the
+    shared page cache. Only the language names and the per-language offsets,
+    one entry per language, are copied into the process.
+    """
+    pairs = map_table('pairs', version, directory)
+    edges = map_table('pair_edges', version, directory)
+    index = map_table('pair_index', version, directory)
+    languages = map_table('pair_languages', version, directory)
+    if pairs is None or edges is None or index is None or languages is None:
+        return None
+
+    def column(table, name):
+        return table.column(name).combine_chunks().to_numpy(zero_copy_only=False)
+
+    return PairStore(
+        column(pairs, 'source_lang_id'),
+        column(pairs, 'target_lang_id'),
+        column(pairs, 'chrf_plus'),
+        column(pairs, 'spbleu_spm_200'),
+        column(languages, 'id'),
+        np.asarray(languages.column('lang_name').to_pylist(), dtype=object),
+        index=(
+            column(pairs, 'score_order'),
+            column(edges, 'edge_row'),
+            column(edges, 'edge_role'),
+            column(index, 'index_id'),
+            np.concatenate([[0], column(index, 'end')]),
+        )
+    )
+
+def export_snapshot(directory=None):
+    """Export the current generation from the database; return its version."""
+    from init_db import get_engine
+    from database import LANGUAGE_SNAPSHOT_QUERY, LANGUAGES, PAIRS
+    import pandas as pd
+
+    engine = get_engine()
+    with engine.begin() as connection:
+        generations = dict(connection.execute(text("SELECT scope, generation FROM data_generation")).all())
+        version = snapshot_version(tuple(generations.get(scope, 0) for scope in (LANGUAGES, PAIRS)))
+        write_language_snapshot(pd.read_sql(text(LANGUAGE_SNAPSHOT_QUERY), connection), version, directory)
+        write_pair_snapshot(load_pair_store(connection), version, directory)
+    return version
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the language and pair snapshot files.")
+    parser.add_argument('--dir', default=snapshot_dir(), help=f"output directory (default: ${SNAPSHOT_DIR_ENV})")
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error(f"set {SNAPSHOT_DIR_ENV} or pass --dir")
+
+    print(f"Wrote snapshot {export_snapshot(args.dir)} to {args.dir}")
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Grid cell size; about 1100 km north-south, so a typical query touches a few cells
+CELL_DEGREES = 10.0
+
+LAT_CELLS = int(180 / CELL_DEGREES)
+LON_CELLS = int(360 / CELL_DEGREES)
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lon, lats, lons = np.radians(lat), np.radians(lon), np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def _cell_rows(lats):
+    return np.clip(((np.asarray(lats) + 90) // CELL_DEGREES).astype(np.int64), 0, LAT_CELLS - 1)
+
+def _cell_columns(lons):
+    return ((np.asarray(lons) + 180) // CELL_DEGREES).astype(np.int64) % LON_CELLS
+
+class SpatialIndex:
+    """Languages bucketed into a fixed latitude/longitude grid with CSR offsets.
+
+    Points are stored sorted by cell, so a cell's languages are the slice
+    offsets[c]:offsets[c + 1]. Queries visit only the cells a search circle
+    can reach and compute exact haversine distances for the points in them.
+    """
+
+    def __init__(self, languages, masks):
+        located = (
+            languages['latitude'].between(-90, 90) & languages['longitude'].between(-180, 180)
+        ).to_numpy()
+        lats = languages['latitude'].to_numpy(dtype=np.float64)[located]
+        lons = languages['longitude'].to_numpy(dtype=np.float64)[located]
+        cells = _cell_rows(lats) * LON_CELLS + _cell_columns(lons)
+
+        order = np.argsort(cells, kind='stable')
+        self.ids = languages['id'].to_numpy(dtype=np.int64)[located][order]
+        self.names = languages['name'].to_numpy(dtype=object)[located][order]
+        self.latitudes = lats[order]
+        self.longitudes = lons[order]
+        self.masks = np.asarray(masks, dtype=np.uint8)[located][order]
+        counts = np.bincount(cells[order], minlength=LAT_CELLS * LON_CELLS)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _candidates(self, lat, lon, radius_km):
+        """Positions of the points in every cell a circle of radius_km can touch."""
+        radius_deg = np.degrees(radius_km / EARTH_RADIUS_KM)
+        low_lat, high_lat = lat - radius_deg, lat + radius_deg
+        rows = np.arange(_cell_rows(max(low_lat, -90)), _cell_rows(min(high_lat, 90)) + 1)
+
+        # Near a pole, or for a circle wider than a hemisphere, take whole rows
+        widest = max(abs(low_lat), abs(high_lat))
+        if widest >= 90 or radius_deg >= 90:
+            columns = np.arange(LON_CELLS)
+        else:
+            half_width = np.degrees(np.arcsin(min(1.0, np.sin(radius_km / EARTH_RADIUS_KM) / np.cos(np.radians(widest)))))
+            first = _cell_columns(lon - half_width)
+            count = min(LON_CELLS, int(np.ceil(2 * half_width / CELL_DEGREES)) + 2)
+            columns = (first + np.arange(count)) % LON_CELLS
+
+        cells = (rows[:, None] * LON_CELLS + np.unique(columns)[None, :]).ravel()
+        starts, ends = self.offsets[cells], self.offsets[cells + 1]
+        if not len(cells) or not (ends - starts).any():
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends) if e > s])
+
+    def _frame(self, positions, distances):
+        return pd.DataFrame({
+            'id': self.ids[positions],
+            'name': self.names[positions],
+            'latitude': self.latitudes[positions],
+            'longitude': self.longitudes[positions],
+            'model_mask': self.masks[positions],
+            'distance_km': distances,
+        })
+
+    def _filter(self, positions, selected_mask):
+        """Keep positions offering at least one model in selected_mask; 0 keeps all."""
+        if not selected_mask:
+            return positions
+        return positions[(self.masks[positions] & selected_mask) != 0]
+
+    def within(self, lat, lon, radius_km, selected_mask=0):
+        """Languages within radius_km of a point, nearest first."""
+        positions = self._filter(self._candidates(lat, lon, radius_km), selected_mask)
+        distances = haversine_km(lat, lon, self.latitudes[positions], self.longitudes[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return self._frame(positions[order], distances[order])
+
+    def nearest(self, lat, lon, k, selected_mask=0, max_km=None):
+        """The k languages nearest a point, optionally no farther than max_km.
+
+        The search radius doubles from one cell until it holds k matches;
+        every point within the final radius has been measured, so the k
+        nearest are exact.
+        """
+        limit = np.pi * EARTH_RADIUS_KM if max_km is None else max_km
+        radius_km = min(limit, np.radians(CELL_DEGREES) * EARTH_RADIUS_KM)
+        while True:
+            found = self.within(lat, lon, radius_km, selected_mask)
+            if len(found) >= k or radius_km >= limit:
+                return found.head(k).reset_index(drop=True)
+            radius_km = min(limit, radius_km * 2)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the index."""
+        arrays = [self.ids, self.latitudes, self.longitudes, self.masks, self.offsets, self.names]
+        return int(sum(a.nbytes for a in arrays))
@@ -0,0 +1,177 @@
+import re
+from collections import namedtuple
+from sqlalchemy import text
+from migrations import DATASET_SQL, LANGUAGE_INDEX_SQL, PAIR_FOREIGN_KEY_SQL, PAIR_INDEX_SQL
+
+# Restores load into STAGING_SCHEMA; the swap moves the replaced live objects
+# to RETIRED_SCHEMA and drops them in the same transaction.
+STAGING_SCHEMA = 'staging'
+RETIRED_SCHEMA = 'retired'
+
+# Tables a backup provides. Their sequences, constraints and indexes are named
+# after them, e.g. language_new_id_seq and nmt_pairs_source_pkey.
+DATASET_TABLES = [
+    'continent', 'language_family', 'language_subfamily', 'language_new', 'nmt_pairs', 'nmt_pairs_source'
+]
+DATASET_OBJECT = re.compile(r'^(?:%s)(?:_\w*)?$' % '|'.join(DATASET_TABLES))
+
+# How long the swap waits for readers to release the live tables
+SWAP_LOCK_TIMEOUT = '2s'
+
+# A validation result; failed checks with fatal set stop the swap
+Check = namedtuple('Check', ['name', 'value', 'ok', 'fatal'])
+
+VALIDATION_SQL = """
+    SELECT
+        (SELECT count(*) FROM language_new) AS languages,
+        (SELECT count(*) FROM nmt_pairs_source) AS pairs,
+        (
+            SELECT count(*) FROM nmt_pairs_source p
+            WHERE p.source_lang_id IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM language_new l WHERE l.id = p.source_lang_id)
+        ) AS orphaned_sources,
+        (
+            SELECT count(*) FROM nmt_pairs_source p
+            WHERE p.target_lang_id IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM language_new l WHERE l.id = p.target_lang_id)
+        ) AS orphaned_targets,
+        (
+            SELECT count(*) FROM language_new
+            WHERE coordinates IS NULL
+                OR NOT ST_IsValid(coordinates::geometry)
+                OR ST_Y(coordinates::geometry) NOT BETWEEN -90 AND 90
+                OR ST_X(coordinates::geometry) NOT BETWEEN -180 AND 180
+        ) AS invalid_coordinates,
+        (SELECT count(*) FROM language_connection_snapshot) AS mapped_languages
+    """
+
+def use_staging(connection):
+    """Resolve unqualified names in staging first for the rest of the transaction.
+
+    Tables the backup did not include still resolve to the live copy in public;
+    stage_dump leaves references to them, such as foreign keys, pointing there.
+    """
+    connection.execute(text(f"SET LOCAL search_path TO {STAGING_SCHEMA}, public"))
+
+def prepare_staging(connection):
+    """Start from an empty staging schema."""
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {STAGING_SCHEMA}"))
+
+def drop_staging(connection):
+    """Discard a staged restore."""
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE"))
+
+def build_staging(connection):
+    """Create the dataset indexes, foreign keys and views over the staged tables."""
+    use_staging(connection)
+    for statement in DATASET_SQL:
+        connection.execute(text(statement))
+
+def validate_staging(connection):
+    """Check the staged dataset in one query and return a list of Checks.
+
+    Empty tables or an empty map stop the swap; orphaned pair ids and
+    unmappable coordinates are reported, as the views already skip them.
+    """
+    use_staging(connection)
+    row = connection.execute(text(VALIDATION_SQL)).mappings().one()
+    return [
+        Check('languages', row['languages'], row['languages'] > 0, True),
+        Check('translation pairs', row['pairs'], row['pairs'] > 0, True),
+        Check('mapped languages', row['mapped_languages'], row['mapped_languages'] > 0, True),
+        Check('orphaned source_lang_id', row['orphaned_sources'], row['orphaned_sources'] == 0, False),
+        Check('orphaned target_lang_id', row['orphaned_targets'], row['orphaned_targets'] == 0, False),
+        Check('invalid coordinates', row['invalid_coordinates'], row['invalid_coordinates'] == 0, False),
+    ]
+
+def staged_relations(connection):
+    """Tables, views and free-standing sequences in staging, as (kind, name) pairs.
+
+    Sequences owned by a table column are left out; they move with their table.
+    """
+    rows = connection.execute(text("""
+        SELECT c.relkind, c.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema
+            AND c.relkind IN ('r', 'm', 'S')
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_depend d
+                WHERE d.classid = 'pg_class'::regclass
+                    AND d.objid = c.oid
+                    AND d.deptype IN ('a', 'i')
+            )
+        ORDER BY c.relkind, c.relname
+        """), {'schema': STAGING_SCHEMA}).all()
+    kinds = {'r': 'TABLE', 'm': 'MATERIALIZED VIEW', 'S': 'SEQUENCE'}
+    return [(kinds[relkind], name) for relkind, name in rows]
+
+def dependent_foreign_keys(connection, names):
+    """Foreign keys that tables outside the swap hold on the live tables in names.
+
+    Returns (table, constraint, definition) triples, with the table schema
+    qualified and the definition from pg_get_constraintdef.
+    """
+    return connection.execute(text("""
+        SELECT format('%I.%I', tn.nspname, t.relname), c.conname, pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        JOIN pg_class t ON t.oid = c.conrelid
+        JOIN pg_namespace tn ON tn.oid = t.relnamespace
+        JOIN pg_class r ON r.oid = c.confrelid
+        JOIN pg_namespace rn ON rn.oid = r.relnamespace
+        WHERE c.contype = 'f'
+            AND rn.nspname = 'public'
+            AND r.relname = ANY(:names)
+            AND tn.nspname NOT IN (:staging, :retired)
+            AND NOT (tn.nspname = 'public' AND t.relname = ANY(:names))
+        ORDER BY 1, 2
+        """), {'names': list(names), 'staging': STAGING_SCHEMA, 'retired': RETIRED_SCHEMA}).all()
+
+def swap_staging(connection):
+    """Replace the live dataset with the staged one in the current transaction.
+
+    Every step only rewrites catalog entries, so the exclusive locks are held
+    for milliseconds and readers see either the old or the new dataset.
+    Returns the names of the relations swapped in.
+    """
+    # Fail fast rather than queue behind a long reader; queued exclusive
+    # locks would block every new reader until granted.
+    connection.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+    # Constraint definitions then name public tables unqualified, so they
+    # resolve to the swapped-in copies when replayed
+    connection.execute(text("SET LOCAL search_path TO public"))
+    relations = staged_relations(connection)
+    live = {
+        name for name, in connection.execute(text("""
+            SELECT c.relname FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public'
+            """)).all()
+    }
+    foreign_keys = dependent_foreign_keys(connection, [name for _, name in relations if name in live])
+
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {RETIRED_SCHEMA}"))
+    for kind, name in relations:
+        if name in live:
+            connection.execute(text(f'ALTER {kind} public."{name}" SET SCHEMA {RETIRED_SCHEMA}'))
+    for kind, name in relations:
+        connection.execute(text(f'ALTER {kind} {STAGING_SCHEMA}."{name}" SET SCHEMA public'))
+
+    # Dropping the old tables also drops foreign keys that tables the backup
+    # did not replace had on them; add those back. They are re-added NOT
+    # VALID so the swap stays catalog-only.
+    connection.execute(text(f"DROP SCHEMA {RETIRED_SCHEMA} CASCADE"))
+    connection.execute(text(f"DROP SCHEMA {STAGING_SCHEMA} CASCADE"))
+    for statement in PAIR_INDEX_SQL + LANGUAGE_INDEX_SQL + PAIR_FOREIGN_KEY_SQL:
+        connection.execute(text(statement))
+    for table, name, definition in foreign_keys:
+        exists = connection.execute(text("""
+            SELECT 1 FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND conname = :name
+            """), {'table': table, 'name': name}).first()
+        if exists is None:
+            if not definition.endswith('NOT VALID'):
+                definition += ' NOT VALID'
+            connection.execute(text(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}'))
+    return [name for _, name in relations]